@@ -1,3 +1,5 @@
+from typing import List, Tuple
+
 GENERATE_POV_IDEAS_PROMPT = """You are an AI specialized in generating viral POV (Point of View) video ideas in a structured, table-ready format. Your sole task is to output exactly 5 unique video ideas following the strict structure and rules below. Do not include explanations, titles, headings, or formatting—only output plain text rows separated by TABs.
 
 Output Format:
@@ -67,22 +69,18 @@ You are an advanced **prompt-generation AI** specializing in crafting **highly d
 
 The specific topic for this scene sequence is about: {pov_idea}
 
-Generate a sequence of 5-7 distinct scenes that follow a logical progression through a day in ancient Egypt, based on this POV character concept. Make sure all scenes are in ancient Egyptian settings and directly relevant to the topic.
+Generate a sequence of exactly 5 distinct scenes that follow a logical progression through a day in ancient Egypt, based on this POV character concept. Make sure all scenes are in ancient Egyptian settings and directly relevant to the topic.
 
 Output only the scene prompts without numbering or bullet points, one per line.
 """
-# Template cho việc tăng cường chi tiết cảnh
-SCENE_DETAIL_PROMPT = """
+# Phần mở đầu cố định (vai trò, quy tắc, ví dụ) của template tăng cường chi tiết cảnh
+SCENE_DETAIL_PREAMBLE = """
 ## Role & Context
 
 You are an advanced prompt-generation AI specializing in expanding short POV (point-of-view) image prompt ideas into detailed, hyper-realistic prompts optimized for image-generation models like Flux and MidJourney.  
 
 Your task is to take a brief input and transform it into a rich, cinematic, immersive prompt that strictly adheres to a first-person perspective, making the viewer feel as if they are physically present in the scene.
 
-This is the Short prompt input to expand upon: [{scene_input}]
- 
-Every prompt must use this to describe the environment of the image: [{environment_desc}]
-
 ---
 
 ## Prompt Structure
@@ -120,4 +118,121 @@ Every prompt must have two sections:
 
 DO NOT include any extra commentary, instructions, or explanations in your response.
 ONLY provide the enhanced prompt text, nothing else.
-"""
\ No newline at end of file
+"""
+# Phần đầu vào thay đổi theo từng cảnh, gửi sau phần mở đầu cố định
+SCENE_DETAIL_INPUT_PROMPT = """
+This is the Short prompt input to expand upon: [{scene_input}]
+
+Every prompt must use this to describe the environment of the image: [{environment_desc}]
+"""
+# Template đầy đủ cho việc tăng cường chi tiết cảnh
+SCENE_DETAIL_PROMPT = SCENE_DETAIL_PREAMBLE + SCENE_DETAIL_INPUT_PROMPT
+# Phần đầu vào khi tăng cường tất cả các cảnh của một ý tưởng trong một request
+BATCH_SCENE_DETAIL_INPUT_PROMPT = """
+Expand EACH of the following short prompt inputs, given as a JSON array, following all the rules above: {scenes_json}
+
+Every prompt must use this to describe the environment of the image: [{environment_desc}]
+
+Respond with ONLY a JSON array of strings containing exactly one enhanced prompt per input, in the same order as the inputs.
+"""
+# Template đầy đủ cho việc tăng cường chi tiết nhiều cảnh cùng lúc
+BATCH_SCENE_DETAIL_PROMPT = SCENE_DETAIL_PREAMBLE + BATCH_SCENE_DETAIL_INPUT_PROMPT
+
+def compile_template(template: str, *fields: str):
+    """
+    Biên dịch template một lần thành các đoạn văn bản cố định quanh placeholder.
+
+    Args:
+        template: Chuỗi template chứa các placeholder dạng {field}
+        *fields: Tên các placeholder theo đúng thứ tự xuất hiện trong template
+
+    Returns:
+        Callable: Hàm nhận giá trị các placeholder (theo thứ tự) và trả về prompt hoàn chỉnh
+    """
+    literals = []
+    rest = template
+    for field in fields:
+        head, sep, rest = rest.partition("{" + field + "}")
+        if not sep:
+            raise ValueError(f"Không tìm thấy placeholder {{{field}}} trong template")
+        literals.append(head)
+    literals.append(rest)
+    literals = tuple(literals)
+
+    def render(*values: str) -> str:
+        parts = [literals[0]]
+        for value, literal in zip(values, literals[1:]):
+            parts.append(value)
+            parts.append(literal)
+        return "".join(parts)
+
+    return render
+
+
+def split_preamble(template: str, marker: str) -> Tuple[str, str]:
+    """
+    Tách template thành phần mở đầu cố định và phần thay đổi theo từng request.
+
+    Args:
+        template: Chuỗi template đầy đủ
+        marker: Đoạn văn bản mở đầu phần thay đổi
+
+    Returns:
+        Tuple[str, str]: (phần mở đầu cố định, phần thay đổi bắt đầu từ marker)
+    """
+    head, sep, tail = template.partition(marker)
+    if not sep:
+        raise ValueError(f"Không tìm thấy marker '{marker}' trong template")
+    return head, sep + tail
+
+
+# Phần mở đầu cố định được gửi như một part riêng, dùng chung cho mọi request
+SCENE_SEQUENCE_PREAMBLE, SCENE_SEQUENCE_INPUT_PROMPT = split_preamble(
+    SCENE_SEQUENCE_PROMPT, "The specific topic for this scene sequence"
+)
+
+# Các template đã biên dịch sẵn, dùng trong vòng lặp xử lý từng cảnh
+render_scene_sequence_input = compile_template(SCENE_SEQUENCE_INPUT_PROMPT, "pov_idea")
+render_scene_detail_input = compile_template(SCENE_DETAIL_INPUT_PROMPT, "scene_input", "environment_desc")
+render_batch_scene_detail_input = compile_template(BATCH_SCENE_DETAIL_INPUT_PROMPT, "scenes_json", "environment_desc")
+
+
+def scene_sequence_parts(pov_idea: str) -> List[str]:
+    """
+    Tạo nội dung request tạo chuỗi cảnh dưới dạng nhiều part.
+
+    Args:
+        pov_idea: Ý tưởng POV gốc
+
+    Returns:
+        List[str]: [phần mở đầu dùng chung, phần đầu vào của ý tưởng]
+    """
+    return [SCENE_SEQUENCE_PREAMBLE, render_scene_sequence_input(pov_idea)]
+
+
+def scene_detail_parts(scene_input: str, environment_desc: str) -> List[str]:
+    """
+    Tạo nội dung request tăng cường chi tiết cảnh dưới dạng nhiều part.
+
+    Args:
+        scene_input: Mô tả cảnh gốc
+        environment_desc: Mô tả môi trường
+
+    Returns:
+        List[str]: [phần mở đầu dùng chung, phần đầu vào của cảnh]
+    """
+    return [SCENE_DETAIL_PREAMBLE, render_scene_detail_input(scene_input, environment_desc)]
+
+
+def batch_scene_detail_parts(scenes_json: str, environment_desc: str) -> List[str]:
+    """
+    Tạo nội dung request tăng cường chi tiết cho nhiều cảnh dưới dạng nhiều part.
+
+    Args:
+        scenes_json: Mảng JSON chứa mô tả các cảnh gốc
+        environment_desc: Mô tả môi trường dùng chung cho các cảnh
+
+    Returns:
+        List[str]: [phần mở đầu dùng chung, phần đầu vào của các cảnh]
+    """
+    return [SCENE_DETAIL_PREAMBLE, render_batch_scene_detail_input(scenes_json, environment_desc)]
@@ -1,16 +1,22 @@
 # config/settings.py
 import os
+import atexit
+import queue
+import functools
 import logging
+import logging.handlers
 from dotenv import load_dotenv
 import pathlib
 import sys
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from typing import NamedTuple
+from urllib.parse import urlencode
 # =============================================================================
 # Basic Configuration
 # =============================================================================
 
-# Load environment variables
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'credentials', '.env'))
+# Load environment variables (set SKIP_DOTENV=1 to skip the file entirely)
+if os.environ.get("SKIP_DOTENV") != "1":
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'credentials', '.env'))
 
 # Base paths
 BASE_DIR = pathlib.Path(__file__).parent.parent.absolute()
@@ -18,12 +24,15 @@ TEMP_DIR = BASE_DIR / "temp"
 CREDENTIALS_DIR = BASE_DIR / "credentials"
 LOGS_DIR = BASE_DIR / "logs"
 
-# Create necessary directories
-TEMP_DIR.mkdir(exist_ok=True)
-LOGS_DIR.mkdir(exist_ok=True)
-(TEMP_DIR / "images").mkdir(exist_ok=True)
-(TEMP_DIR / "videos").mkdir(exist_ok=True)
-(TEMP_DIR / "audio").mkdir(exist_ok=True)
+# Create necessary directories (once per process)
+@functools.cache
+def ensure_dirs() -> None:
+    for path in (TEMP_DIR, LOGS_DIR, TEMP_DIR / "images", TEMP_DIR / "videos", TEMP_DIR / "audio"):
+        path.mkdir(exist_ok=True)
+
+# Set LAZY_DIRS=1 to skip the bootstrap at import and call ensure_dirs() explicitly
+if os.environ.get("LAZY_DIRS") != "1":
+    ensure_dirs()
 
 # =============================================================================
 # API Keys & Authentication
@@ -49,6 +58,9 @@ YOUTUBE_REFRESH_TOKEN = os.getenv("YOUTUBE_REFRESH_TOKEN")
 # Media Generation Settings
 # =============================================================================
 
+# Scene Prompt Enhancement (Gemini)
+ENHANCE_WORKERS = 8  # Concurrent per-scene Gemini calls when the batched request fails
+
 # Image Generation (Pollinations.ai)
 POLLINATIONS_IMAGE_WIDTH = 540
 POLLINATIONS_IMAGE_HEIGHT = 960
@@ -56,16 +68,43 @@ POLLINATIONS_MODEL = "flux"  # Model used for image generation
 POLLINATIONS_SEED = 42  # Fixed seed for reproducibility
 POLLINATIONS_URL = "https://image.pollinations.ai/prompt/{prompt}"
 POLLINATIONS_NO_LOGO = True
+# Query string is invariant across images: encode it once, only the prompt varies per call
+POLLINATIONS_QUERY = urlencode({
+    "width": POLLINATIONS_IMAGE_WIDTH,
+    "height": POLLINATIONS_IMAGE_HEIGHT,
+    "model": POLLINATIONS_MODEL,
+    "seed": POLLINATIONS_SEED,
+    "nologo": "true" if POLLINATIONS_NO_LOGO else "false"
+})
+POLLINATIONS_URL_TEMPLATE = f"{POLLINATIONS_URL}?{POLLINATIONS_QUERY}"  # format with a percent-encoded prompt
+IMAGE_DOWNLOAD_CHUNK_SIZE = 64 * 1024  # Images are streamed to temp/images in blocks of this size
+IMAGE_CACHE_ENABLED = True  # Reuse images already generated and uploaded for the same prompt and parameters
+IMAGE_CACHE_MAX_AGE = 30 * 24 * 3600  # seconds
+IMAGE_WORKERS = 5  # Concurrent Pollinations requests during image generation
+IMAGE_UPLOAD_WORKERS = 4  # Concurrent Drive uploads of finished images (separate pool, never blocks generation)
+POLLINATIONS_RATE_LIMIT = 1  # Pollinations requests per second, shared by all image workers
+POLLINATIONS_RATE_BURST = 3
 
 # Audio Generation (ElevenLabs)
 ELEVENLABS_URL = "https://api.elevenlabs.io/v1/sound-generation"
 ELEVENLABS_DURATION = 5  # seconds
 ELEVENLABS_PROMPT_INFLUENCE = 0.6
 ELEVENLABS_VOICE_ID = "default"  # Use default voice
+TTS_BACKEND = "gtts"  # "gtts" (Google Translate TTS, network) or "piper" (local model, no network)
+TTS_LANGUAGE = "en"  # gTTS language code
+PIPER_VOICE_MODEL = str(CREDENTIALS_DIR / "en_US-amy-medium.onnx")  # Piper voice used when TTS_BACKEND == "piper"
+TTS_CHUNK_CHARS = 100  # gTTS request size limit; longer texts are split at sentence boundaries
+TTS_CHUNK_WORKERS = 4  # Chunks of one text synthesized concurrently
+KEEP_LOCAL_AUDIO = True  # Also write generated MP3s to temp/audio (uploads use the in-memory bytes)
+AUDIO_WORKERS = 8  # Concurrent scenes during audio generation (TTS + Drive upload are network-bound)
+TTS_RATE_LIMIT = 4  # gTTS requests per second, shared by all audio workers
+TTS_RATE_BURST = 8
+DRIVE_RATE_LIMIT = 8  # Drive write requests per second (per-user quota is about 10)
+DRIVE_RATE_BURST = 16
 
 # FFmpeg Video Settings
-FFMPEG_ZOOM_FILTER = "zoompan=z='if(lte(zoom,1.0),1.0,min(zoom+0.002,2.0))':x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':d=125:s=540x960"
-FFMPEG_VIDEO_DURATION = 5  # seconds
+FFMPEG_ZOOM_FILTER = "zoompan=z='min(zoom+0.0015,1.5)':d=300"
+FFMPEG_VIDEO_DURATION = 10  # seconds
 FFMPEG_CODEC = "libx264"
 FFMPEG_PIXEL_FORMAT = "yuv420p"
 
@@ -81,10 +120,21 @@ CREATOMATE_OUTPUT_QUALITY = "high"
 
 # File Naming
 IMAGE_FILENAME_TEMPLATE = "images_{index:03d}.png"
-VIDEO_FILENAME_TEMPLATE = "video_{index:03d}.mp4"
+VIDEO_FILENAME_TEMPLATE = "pov_video_{index:03d}.mp4"
 AUDIO_FILENAME_TEMPLATE = "audio_{index:03d}.mp3"
 FINAL_VIDEO_FILENAME = "final_video_{timestamp}.mp4"
 
+def _compile_filename_template(template: str, field: str, spec: str):
+    """Turn a str.format filename template into a bound %-format callable, parsed once."""
+    prefix, _, suffix = template.partition(field)
+    return (prefix.replace("%", "%%") + spec + suffix.replace("%", "%%")).__mod__
+
+# Precompiled filename builders, e.g. image_filename(1) -> "images_001.png"
+image_filename = _compile_filename_template(IMAGE_FILENAME_TEMPLATE, "{index:03d}", "%03d")
+video_filename = _compile_filename_template(VIDEO_FILENAME_TEMPLATE, "{index:03d}", "%03d")
+audio_filename = _compile_filename_template(AUDIO_FILENAME_TEMPLATE, "{index:03d}", "%03d")
+final_video_filename = _compile_filename_template(FINAL_VIDEO_FILENAME, "{timestamp}", "%s")
+
 # Video settings
 MAX_SCENES_PER_VIDEO = 5
 VIDEO_RESOLUTION = (540, 960)  # width, height
@@ -98,23 +148,25 @@ SHEET_NAME = "youtube"  # Default sheet name
 IDEAS_SHEET_RANGE = "A:G"  # Range for storing ideas
 VIDEOS_SHEET_RANGE = "A:I"  # Range for tracking videos
 
-# Column Definitions
-COLUMNS = {
-    "ID": 0,
-    "IDEA": 1,
-    "HASHTAG": 2,
-    "CAPTION": 3,
-    "PRODUCTION": 4,
-    "ENVIRONMENT_PROMPT": 5,
-    "STATUS_PUBLISHING": 6,
-    "VIDEO_URL": 7
-}
-
-# Status Values
-STATUS_PENDING = "pending"
-STATUS_FOR_PRODUCTION = "for production"
-STATUS_FOR_PUBLISHING = "for publishing"
-STATUS_PUBLISHED = "published"
+# Column Definitions (access by attribute, e.g. row[COLUMNS.IDEA])
+class _Columns(NamedTuple):
+    ID: int = 0
+    IDEA: int = 1
+    HASHTAG: int = 2
+    CAPTION: int = 3
+    PRODUCTION: int = 4
+    ENVIRONMENT_PROMPT: int = 5
+    STATUS_PUBLISHING: int = 6
+    VIDEO_URL: int = 7
+
+COLUMNS = _Columns()
+COLUMNS_DICT = COLUMNS._asdict()  # Legacy string-keyed mapping
+
+# Status Values (interned: values with spaces are not interned automatically)
+STATUS_PENDING = sys.intern("pending")
+STATUS_FOR_PRODUCTION = sys.intern("for production")
+STATUS_FOR_PUBLISHING = sys.intern("for publishing")
+STATUS_PUBLISHED = sys.intern("published")
 
 # =============================================================================
 # General Application Settings
@@ -123,34 +175,68 @@ STATUS_PUBLISHED = "published"
 # Retry Mechanism
 MAX_RETRIES = 5
 RETRY_DELAY = 3  # seconds
+RETRY_BASE_DELAY = 0.5  # seconds, doubled after each failed attempt
+RETRY_MAX_DELAY = 30  # seconds
+RETRY_JITTER = 0.3  # +/- fraction of the delay, spreads out simultaneous retries
+STEP_RETRY_MAX_DELAY = 300  # seconds, cap for whole-step retries in main.py (starting from RETRY_DELAY)
 
 # Logging Configuration
 LOG_LEVEL = logging.INFO
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_FILE = LOGS_DIR / "app.log"
+LOG_MAX_BYTES = 10_000_000  # rotate app.log once it reaches this size
+LOG_BACKUP_COUNT = 3
+LOG_FORMATTER = logging.Formatter(LOG_FORMAT)
+
+@functools.cache
+def configure_logging() -> None:
+    """
+    Route the root logger through a queue to the shared file and console handlers (once per process).
+    Worker threads only enqueue records; a single listener thread does the writes.
+    """
+    ensure_dirs()
+    root_logger = logging.getLogger()
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    handlers = (file_handler, logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(LOG_FORMATTER)
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # flush queued records before the process exits
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(LOG_LEVEL)
+
+# Cache files/directories in TEMP_DIR that survive clean_temp_directory
+TEMP_CACHE_ENTRIES = frozenset({
+    "tts_cache.json", "tts_cache", "image_cache.json", "image_cache", "prompt_cache.json",
+    ".reqs.sha256",  # run_locally.py: hash of requirements.txt already installed by pip
+})
 
 # Timeouts
 API_TIMEOUT = 60  # seconds
 FFMPEG_TIMEOUT = 300  # seconds
 UPLOAD_TIMEOUT = 600  # seconds
 
-# Workflow Settings
+# Google Drive Uploads (smaller files go up in a single multipart request)
+DRIVE_RESUMABLE_THRESHOLD = 5 * 1024 * 1024  # bytes
+DRIVE_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # bytes per resumable chunk, multiple of 256 KB
+
+# Workflow Settings (a disabled stage is passed through without running)
 RUN_IDEA_GENERATION = True
+RUN_SCENE_GENERATION = True
 RUN_PROMPT_ENHANCEMENT = True
 RUN_IMAGE_GENERATION = True
 RUN_VIDEO_PROCESSING = True
 RUN_AUDIO_GENERATION = True
 RUN_VIDEO_COMPOSITION = True
 RUN_YOUTUBE_UPLOAD = True
-# Cấu hình FFmpeg
-FFMPEG_ZOOM_FILTER = "zoompan=z='min(zoom+0.0015,1.5)':d=300"
-FFMPEG_VIDEO_DURATION = 10  # Thời lượng video (giây)
-FFMPEG_CODEC = "libx264"  # Codec mã hóa video
-FFMPEG_PIXEL_FORMAT = "yuv420p"  # Định dạng pixel
-VIDEO_FILENAME_TEMPLATE = "pov_video_{index:03d}.mp4"  # Template tên file video
-MAX_SCENES_PER_VIDEO = 5  # Số cảnh tối đa trong một video
+STOP_ON_ERROR = True  # Skip stages whose dependencies failed
+PRETTY_JSON = True  # Indent intermediate JSON files for reading; False writes compact JSON
+PERSIST_INTERMEDIATE_RESULTS = True  # Write debug-only result files (no later stage reads them, e.g. idea_results.json)
+
 # Theme and Content
 POV_THEME = "Ancient Egyptian"
 POV_CATEGORIES = ["Pharaoh", "Scribe", "Priest", "Craftsman", "Soldier", "Merchant"]
-# Thư mục chứa thông tin xác thực
-CREDENTIALS_DIR = os.path.join(BASE_DIR, "credentials")
@@ -11,32 +11,108 @@ import sys
 import subprocess
 import argparse
 import shutil
-import time
 import logging
-import json
+import hashlib
+import re
+import functools
+from collections import ChainMap, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
-import sys
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from typing import List, Dict
+
 # Thiết lập đường dẫn cơ bản
 BASE_DIR = Path(__file__).resolve().parent
 CREDENTIALS_DIR = BASE_DIR / "credentials"
 TEMP_DIR = BASE_DIR / "temp"
 LOGS_DIR = BASE_DIR / "logs"
 ENV_FILE = CREDENTIALS_DIR / ".env"
+REQUIREMENTS_HASH_FILE = TEMP_DIR / ".reqs.sha256"
+
+# Các thư mục cần có trước khi chạy hệ thống
+REQUIRED_DIRS = (
+    CREDENTIALS_DIR,
+    TEMP_DIR,
+    LOGS_DIR,
+    TEMP_DIR / "images",
+    TEMP_DIR / "videos",
+    TEMP_DIR / "audio"
+)
 
-# Thiết lập logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOGS_DIR / "run_locally.log") if LOGS_DIR.exists() else logging.StreamHandler(),
-        logging.StreamHandler()
-    ]
+# Các API key bắt buộc và các key YouTube (chỉ cần khi xuất bản)
+REQUIRED_KEYS = (
+    "GEMINI_API_KEY",
+    "ELEVENLABS_API_KEY",
+    "CREATOMATE_API_KEY",
+    "GOOGLE_SHEETS_SPREADSHEET_ID",
+    "GOOGLE_APPLICATION_CREDENTIALS"
 )
+YOUTUBE_KEYS = ("YOUTUBE_CLIENT_ID", "YOUTUBE_CLIENT_SECRET", "YOUTUBE_REFRESH_TOKEN")
+
+# Các bước của quy trình, theo đúng thứ tự trong scripts.main
+VALID_STEPS = ("ideas", "scenes", "prompts", "images", "videos", "audio", "compose", "publish")
+VALID_STEP_SET = frozenset(VALID_STEPS)
+ALL_STEPS = VALID_STEPS + ("all",)
+
+STEP_DESCRIPTIONS = {
+    "ideas": "Tạo ý tưởng POV",
+    "scenes": "Tạo chuỗi cảnh",
+    "prompts": "Tăng cường prompt",
+    "images": "Tạo hình ảnh",
+    "videos": "Xử lý video",
+    "audio": "Tạo âm thanh",
+    "compose": "Ghép video",
+    "publish": "Đăng tải YouTube"
+}
+
 logger = logging.getLogger("run_locally")
 
+def _configure_logging():
+    """
+    Cấu hình logging; chỉ gọi sau khi thư mục logs đã được tạo.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler(LOGS_DIR / "run_locally.log", encoding="utf-8"),
+            logging.StreamHandler()
+        ]
+    )
+
+@functools.lru_cache(maxsize=1)
+def _env_cache(mtime_ns: int) -> ChainMap:
+    """
+    Đọc file .env một lần cho mỗi phiên bản của file (xác định bằng mtime).
+    
+    Args:
+        mtime_ns: Thời điểm sửa đổi file .env, dùng làm khóa cache
+        
+    Returns:
+        ChainMap: Biến môi trường của tiến trình, sau đó đến giá trị trong .env
+    """
+    from dotenv import dotenv_values
+    
+    values = {key: value for key, value in dotenv_values(ENV_FILE).items() if value is not None}
+    
+    # Nạp vào os.environ giống load_dotenv: không ghi đè biến đã có
+    for key, value in values.items():
+        os.environ.setdefault(key, value)
+    
+    return ChainMap(os.environ, values)
+
+def load_env() -> ChainMap:
+    """
+    Nạp biến môi trường từ file .env, chỉ đọc lại file khi file đã thay đổi.
+    
+    Returns:
+        ChainMap: Các biến môi trường hiệu lực
+    """
+    try:
+        mtime_ns = ENV_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = 0
+    return _env_cache(mtime_ns)
+
 def check_python_version():
     """
     Kiểm tra phiên bản Python đã đạt yêu cầu chưa.
@@ -45,39 +121,71 @@ def check_python_version():
     current_version = sys.version_info
     
     if current_version < required_version:
-        logger.error(f"Cần Python phiên bản {required_version[0]}.{required_version[1]} trở lên. "
-                     f"Phiên bản hiện tại: {current_version[0]}.{current_version[1]}")
+        logger.error("Cần Python phiên bản %d.%d trở lên. Phiên bản hiện tại: %d.%d",
+                     required_version[0], required_version[1], current_version[0], current_version[1])
         return False
     
-    logger.info(f"Đang sử dụng Python {current_version[0]}.{current_version[1]}.{current_version[2]}")
+    logger.info("Đang sử dụng Python %d.%d.%d", current_version[0], current_version[1], current_version[2])
     return True
 
-def check_ffmpeg():
+@functools.lru_cache(maxsize=None)
+def check_ffmpeg(verbose: bool = False):
     """
     Kiểm tra FFmpeg đã được cài đặt chưa.
     
+    Args:
+        verbose: Chạy thêm 'ffmpeg -version' để ghi log phiên bản
+    
     Returns:
         bool: True nếu đã cài đặt, False nếu chưa
     """
-    try:
-        result = subprocess.run(
-            ["ffmpeg", "-version"], 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE,
-            check=False
-        )
+    ffmpeg_path = shutil.which("ffmpeg")
+    if not ffmpeg_path:
+        logger.error("FFmpeg không được cài đặt hoặc không có trong PATH")
+        return False
+    
+    logger.info("Đã tìm thấy FFmpeg tại %s", ffmpeg_path)
+    
+    if verbose:
+        # Chỉ đọc dòng đầu tiên chứa thông tin phiên bản
+        with subprocess.Popen(
+            [ffmpeg_path, "-version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        ) as process:
+            version_output = process.stdout.readline(512).decode("utf-8", "replace").rstrip()
+            process.terminate()
         
-        if result.returncode == 0:
-            version_output = result.stdout.decode('utf-8').splitlines()[0]
-            logger.info(f"Đã tìm thấy FFmpeg: {version_output}")
-            return True
-        else:
-            logger.error("FFmpeg không được cài đặt hoặc không thể truy cập")
+        if not version_output:
+            logger.error("FFmpeg không thể truy cập")
             return False
+        
+        logger.info("Phiên bản FFmpeg: %s", version_output)
     
-    except FileNotFoundError:
-        logger.error("FFmpeg không được cài đặt hoặc không có trong PATH")
-        return False
+    return True
+
+@functools.lru_cache(maxsize=64)
+def _exists(path: str) -> bool:
+    """
+    Kiểm tra đường dẫn tồn tại, lưu kết quả trong suốt tiến trình.
+    Gọi _exists.cache_clear() sau khi tạo file mới.
+    
+    Args:
+        path: Đường dẫn cần kiểm tra
+        
+    Returns:
+        bool: True nếu đường dẫn tồn tại
+    """
+    return os.path.exists(path)
+
+@functools.cache
+def ensure_dirs():
+    """
+    Tạo các thư mục cần thiết, chỉ một lần cho mỗi tiến trình.
+    """
+    for directory in REQUIRED_DIRS:
+        if not directory.is_dir():
+            directory.mkdir(parents=True, exist_ok=True)
 
 def setup_environment():
     """
@@ -88,41 +196,61 @@ def setup_environment():
     """
     try:
         # Tạo thư mục cần thiết
-        CREDENTIALS_DIR.mkdir(exist_ok=True)
-        TEMP_DIR.mkdir(exist_ok=True)
-        LOGS_DIR.mkdir(exist_ok=True)
-        
-        # Tạo các thư mục con trong temp
-        (TEMP_DIR / "images").mkdir(exist_ok=True)
-        (TEMP_DIR / "videos").mkdir(exist_ok=True)
-        (TEMP_DIR / "audio").mkdir(exist_ok=True)
+        ensure_dirs()
         
         # Kiểm tra file .env
-        if not ENV_FILE.exists():
+        if not _exists(str(ENV_FILE)):
             example_env = CREDENTIALS_DIR / ".env.example"
-            if example_env.exists():
+            if _exists(str(example_env)):
                 shutil.copy(example_env, ENV_FILE)
-                logger.warning(f"Đã tạo file .env từ .env.example. Vui lòng cập nhật các thông tin xác thực trong {ENV_FILE}")
+                _exists.cache_clear()
+                logger.warning("Đã tạo file .env từ .env.example. Vui lòng cập nhật các thông tin xác thực trong %s", ENV_FILE)
             else:
                 logger.error("Không tìm thấy file .env.example để tạo file .env")
                 logger.info("Vui lòng tạo file credentials/.env với các thông tin xác thực cần thiết")
         
         # Nạp biến môi trường từ file .env
-        load_dotenv(ENV_FILE)
+        env = load_env()
         
         # Kiểm tra file service account
-        service_account_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-        if service_account_path and not os.path.exists(service_account_path):
-            logger.error(f"Không tìm thấy file service account: {service_account_path}")
+        service_account_path = env.get("GOOGLE_APPLICATION_CREDENTIALS")
+        if service_account_path and not _exists(service_account_path):
+            logger.error("Không tìm thấy file service account: %s", service_account_path)
             logger.info("Vui lòng đặt file service account JSON vào đúng vị trí hoặc cập nhật đường dẫn trong file .env")
         
         logger.info("Đã thiết lập môi trường làm việc thành công")
         return True
         
     except Exception as e:
-        logger.error(f"Lỗi khi thiết lập môi trường: {str(e)}")
+        logger.error("Lỗi khi thiết lập môi trường: %s", e)
         return False
 
+def find_missing_requirements(requirements_file: Path) -> List[str]:
+    """
+    Tìm các thư viện trong requirements.txt chưa được cài đặt.
+    
+    Args:
+        requirements_file: Đường dẫn đến file requirements.txt
+        
+    Returns:
+        List[str]: Các dòng yêu cầu có thư viện chưa được cài đặt
+    """
+    import importlib.metadata
+    
+    missing = []
+    for line in requirements_file.read_text().splitlines():
+        requirement = line.split("#", 1)[0].strip()
+        if not requirement:
+            continue
+        
+        name = re.split(r"[\[<>=!~;\s]", requirement, maxsplit=1)[0]
+        try:
+            importlib.metadata.distribution(name)
+        except importlib.metadata.PackageNotFoundError:
+            missing.append(requirement)
+    
+    return missing
+
 def check_dependencies():
     """
     Kiểm tra và cài đặt các thư viện Python cần thiết.
@@ -133,28 +261,52 @@ def check_dependencies():
     try:
         # Kiểm tra file requirements.txt
         requirements_file = BASE_DIR / "requirements.txt"
-        if not requirements_file.exists():
-            logger.error(f"Không tìm thấy file requirements.txt")
+        if not _exists(str(requirements_file)):
+            logger.error("Không tìm thấy file requirements.txt")
             return False
         
-        # Kiểm tra và cài đặt các thư viện
+        # Bỏ qua pip nếu requirements.txt không đổi kể từ lần cài đặt thành công gần nhất
+        requirements_hash = hashlib.sha256(requirements_file.read_bytes()).hexdigest()
+        if REQUIREMENTS_HASH_FILE.exists() and REQUIREMENTS_HASH_FILE.read_text().strip() == requirements_hash:
+            logger.info("requirements.txt không thay đổi, bỏ qua cài đặt thư viện")
+            return True
+        
+        # Kiểm tra các thư viện đã cài qua metadata, chỉ gọi pip cho thư viện còn thiếu
         logger.info("Kiểm tra các thư viện Python...")
-        result = subprocess.run(
-            [sys.executable, "-m", "pip", "install", "-r", str(requirements_file)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=False
-        )
+        missing = find_missing_requirements(requirements_file)
+        
+        if missing:
+            logger.info("Cài đặt các thư viện còn thiếu: %s", ', '.join(missing))
+            process = subprocess.Popen(
+                [sys.executable, "-m", "pip", "install", *missing],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1
+            )
+            
+            # Đọc stderr theo từng dòng, chỉ giữ lại phần cuối để báo lỗi
+            stderr_tail = deque(maxlen=20)
+            for line in process.stderr:
+                line = line.rstrip()
+                logger.debug("pip: %s", line)
+                stderr_tail.append(line)
+            
+            if process.wait() != 0:
+                logger.error("Lỗi khi cài đặt thư viện: %s", "\n".join(stderr_tail))
+                return False
         
-        if result.returncode != 0:
-            logger.error(f"Lỗi khi cài đặt thư viện: {result.stderr.decode('utf-8')}")
-            return False
+        # Lưu hash để các lần chạy sau không cần gọi pip
+        REQUIREMENTS_HASH_FILE.parent.mkdir(exist_ok=True)
+        REQUIREMENTS_HASH_FILE.write_text(requirements_hash)
         
         logger.info("Đã cài đặt tất cả thư viện cần thiết")
         return True
         
     except Exception as e:
-        logger.error(f"Lỗi khi kiểm tra và cài đặt thư viện: {str(e)}")
+        logger.error("Lỗi khi kiểm tra và cài đặt thư viện: %s", e)
         return False
 
 def validate_api_keys():
@@ -164,35 +316,68 @@ def validate_api_keys():
     Returns:
         bool: True nếu có đủ API key, False nếu thiếu
     """
-    required_keys = [
-        "GEMINI_API_KEY",
-        "ELEVENLABS_API_KEY",
-        "CREATOMATE_API_KEY",
-        "GOOGLE_SHEETS_SPREADSHEET_ID",
-        "GOOGLE_APPLICATION_CREDENTIALS"
-    ]
-    
-    missing_keys = []
-    for key in required_keys:
-        if not os.getenv(key):
-            missing_keys.append(key)
-    
-    if missing_keys:
-        logger.error(f"Thiếu các API key sau: {', '.join(missing_keys)}")
+    env = load_env()
+    
+    if not all(env.get(key) for key in REQUIRED_KEYS):
+        missing_keys = [key for key in REQUIRED_KEYS if not env.get(key)]
+        logger.error("Thiếu các API key sau: %s", ', '.join(missing_keys))
         logger.info("Vui lòng cập nhật các API key trong file credentials/.env")
         return False
     
-    # Kiểm tra các key YouTube nếu cần xuất bản
-    youtube_keys = ["YOUTUBE_CLIENT_ID", "YOUTUBE_CLIENT_SECRET", "YOUTUBE_REFRESH_TOKEN"]
-    missing_youtube_keys = [key for key in youtube_keys if not os.getenv(key)]
-    
-    if missing_youtube_keys:
-        logger.warning(f"Thiếu các API key YouTube: {', '.join(missing_youtube_keys)}")
+    # Kiểm tra các key YouTube nếu cần xuất bản (chỉ để cảnh báo)
+    if logger.isEnabledFor(logging.WARNING) and not all(env.get(key) for key in YOUTUBE_KEYS):
+        missing_youtube_keys = [key for key in YOUTUBE_KEYS if not env.get(key)]
+        logger.warning("Thiếu các API key YouTube: %s", ', '.join(missing_youtube_keys))
         logger.warning("Có thể không xuất bản video lên YouTube")
     
     logger.info("Đã xác thực tất cả API key cần thiết")
     return True
 
+def run_environment_checks(verbose: bool = False) -> Dict[str, bool]:
+    """
+    Chạy song song các bước kiểm tra môi trường.
+    
+    check_ffmpeg và check_dependencies chạy tiến trình con nên được chạy đồng thời;
+    validate_api_keys cần .env đã được nạp nên chỉ chạy sau setup_environment.
+    
+    Args:
+        verbose: Ghi log chi tiết (ví dụ phiên bản FFmpeg)
+    
+    Returns:
+        Dict[str, bool]: Kết quả của từng bước kiểm tra
+    """
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        f_python = executor.submit(check_python_version)
+        f_ffmpeg = executor.submit(check_ffmpeg, verbose)
+        f_env = executor.submit(setup_environment)
+        f_deps = executor.submit(check_dependencies)
+        
+        env_ok = f_env.result()
+        f_api = executor.submit(validate_api_keys)
+        
+        return {
+            "python": f_python.result(),
+            "ffmpeg": f_ffmpeg.result(),
+            "env": env_ok,
+            "deps": f_deps.result(),
+            "api": f_api.result()
+        }
+
+def _confirm(prompt, skip=False):
+    """
+    Hỏi người dùng xác nhận.
+    
+    Args:
+        prompt: Câu hỏi hiển thị
+        skip: Bỏ qua câu hỏi và coi như đã xác nhận
+        
+    Returns:
+        bool: True nếu người dùng đồng ý
+    """
+    if skip:
+        return True
+    return input(prompt).strip().lower() in ("y", "yes")
+
 def run_step(step_name, skip_prompt=False):
     """
     Chạy một bước cụ thể trong quy trình.
@@ -204,37 +389,72 @@ def run_step(step_name, skip_prompt=False):
     Returns:
         int: Mã trạng thái (0 nếu thành công)
     """
-    valid_steps = ["ideas", "prompts", "images", "videos", "audio", "compose", "publish", "all"]
-    
-    if step_name not in valid_steps:
-        logger.error(f"Bước không hợp lệ: {step_name}")
+    if step_name != "all" and step_name not in VALID_STEP_SET:
+        logger.error("Bước không hợp lệ: %s", step_name)
         return 1
     
-    if not skip_prompt and step_name != "all":
-        confirmation = input(f"Bạn có muốn chạy bước '{step_name}'? (y/n): ")
-        if confirmation.lower() != 'y':
-            logger.info(f"Đã hủy chạy bước '{step_name}'")
-            return 0
+    if step_name != "all" and not _confirm(f"Bạn có muốn chạy bước '{step_name}'? (y/n): ", skip_prompt):
+        logger.info("Đã hủy chạy bước '%s'", step_name)
+        return 0
     
     try:
         if step_name == "all":
             logger.info("Chạy toàn bộ quy trình tạo video...")
             command = [sys.executable, "-m", "scripts.main", "--all"]
         else:
-            logger.info(f"Chạy bước: {step_name}...")
+            logger.info("Chạy bước: %s...", step_name)
             command = [sys.executable, "-m", "scripts.main", "--step", step_name]
         
-        process = subprocess.run(command, check=False)
+        returncode = subprocess.call(command)
+        
+        if returncode == 0:
+            logger.info("Đã chạy thành công bước '%s'", step_name)
+        else:
+            logger.error("Lỗi khi chạy bước '%s', mã lỗi: %s", step_name, returncode)
+        
+        return returncode
+    
+    except Exception as e:
+        logger.error("Lỗi khi chạy bước '%s': %s", step_name, e)
+        return 1
+
+def run_steps(steps: List[str], skip_prompt=False):
+    """
+    Chạy nhiều bước trong cùng một tiến trình scripts.main.
+    
+    Args:
+        steps: Danh sách tên các bước cần chạy
+        skip_prompt: Bỏ qua xác nhận từ người dùng
+        
+    Returns:
+        int: Mã trạng thái (0 nếu thành công)
+    """
+    invalid_steps = [step for step in steps if step not in VALID_STEP_SET]
+    if not steps or invalid_steps:
+        logger.error("Bước không hợp lệ: %s", ', '.join(invalid_steps) or "(trống)")
+        return 1
+    
+    steps_arg = ",".join(steps)
+    
+    if not _confirm(f"Bạn có muốn chạy các bước '{steps_arg}'? (y/n): ", skip_prompt):
+        logger.info("Đã hủy chạy các bước '%s'", steps_arg)
+        return 0
+    
+    try:
+        logger.info("Chạy các bước: %s...", steps_arg)
+        command = [sys.executable, "-m", "scripts.main", "--steps", steps_arg]
+        
+        returncode = subprocess.call(command)
         
-        if process.returncode == 0:
-            logger.info(f"Đã chạy thành công bước '{step_name}'")
+        if returncode == 0:
+            logger.info("Đã chạy thành công các bước '%s'", steps_arg)
         else:
-            logger.error(f"Lỗi khi chạy bước '{step_name}', mã lỗi: {process.returncode}")
+            logger.error("Lỗi khi chạy các bước '%s', mã lỗi: %s", steps_arg, returncode)
         
-        return process.returncode
+        return returncode
     
     except Exception as e:
-        logger.error(f"Lỗi khi chạy bước '{step_name}': {str(e)}")
+        logger.error("Lỗi khi chạy các bước '%s': %s", steps_arg, e)
         return 1
 
 def run_custom_pipeline(start_step, end_step, skip_prompt=False):
@@ -249,46 +469,45 @@ def run_custom_pipeline(start_step, end_step, skip_prompt=False):
     Returns:
         int: Mã trạng thái (0 nếu thành công)
     """
-    valid_steps = ["ideas", "prompts", "images", "videos", "audio", "compose", "publish"]
-    
-    if start_step not in valid_steps or end_step not in valid_steps:
-        logger.error(f"Bước không hợp lệ: {start_step} hoặc {end_step}")
+    if start_step not in VALID_STEP_SET or end_step not in VALID_STEP_SET:
+        logger.error("Bước không hợp lệ: %s hoặc %s", start_step, end_step)
         return 1
     
-    start_index = valid_steps.index(start_step)
-    end_index = valid_steps.index(end_step)
+    start_index = VALID_STEPS.index(start_step)
+    end_index = VALID_STEPS.index(end_step)
     
     if start_index > end_index:
-        logger.error(f"Bước bắt đầu ({start_step}) không thể sau bước kết thúc ({end_step})")
+        logger.error("Bước bắt đầu (%s) không thể sau bước kết thúc (%s)", start_step, end_step)
         return 1
     
-    if not skip_prompt:
-        confirmation = input(f"Bạn có muốn chạy quy trình từ '{start_step}' đến '{end_step}'? (y/n): ")
-        if confirmation.lower() != 'y':
-            logger.info(f"Đã hủy chạy quy trình")
-            return 0
+    if not _confirm(f"Bạn có muốn chạy quy trình từ '{start_step}' đến '{end_step}'? (y/n): ", skip_prompt):
+        logger.info("Đã hủy chạy quy trình")
+        return 0
     
     try:
-        logger.info(f"Chạy quy trình từ '{start_step}' đến '{end_step}'...")
+        logger.info("Chạy quy trình từ '%s' đến '%s'...", start_step, end_step)
         command = [sys.executable, "-m", "scripts.main", "--start", start_step, "--end", end_step]
         
-        process = subprocess.run(command, check=False)
+        returncode = subprocess.call(command)
         
-        if process.returncode == 0:
-            logger.info(f"Đã chạy thành công quy trình từ '{start_step}' đến '{end_step}'")
+        if returncode == 0:
+            logger.info("Đã chạy thành công quy trình từ '%s' đến '%s'", start_step, end_step)
         else:
-            logger.error(f"Lỗi khi chạy quy trình, mã lỗi: {process.returncode}")
+            logger.error("Lỗi khi chạy quy trình, mã lỗi: %s", returncode)
         
-        return process.returncode
+        return returncode
     
     except Exception as e:
-        logger.error(f"Lỗi khi chạy quy trình: {str(e)}")
+        logger.error("Lỗi khi chạy quy trình: %s", e)
         return 1
 
-def generate_youtube_tokens():
+def generate_youtube_tokens(skip_prompt=False):
     """
     Tạo refresh token cho YouTube API bằng OAuth2.
     
+    Args:
+        skip_prompt: Bỏ qua xác nhận từ người dùng
+    
     Returns:
         bool: True nếu tạo token thành công, False nếu thất bại
     """
@@ -298,20 +517,24 @@ def generate_youtube_tokens():
         print("Quy trình này sẽ mở trình duyệt để bạn xác thực với Google.")
         print("Sau khi xác thực, token sẽ được lưu vào file .env")
         
-        confirmation = input("Tiếp tục? (y/n): ")
-        if confirmation.lower() != 'y':
+        if not _confirm("Tiếp tục? (y/n): ", skip_prompt):
             logger.info("Đã hủy quy trình xác thực YouTube")
             return False
         
         # Kiểm tra client ID và client secret
-        client_id = os.getenv("YOUTUBE_CLIENT_ID")
-        client_secret = os.getenv("YOUTUBE_CLIENT_SECRET")
+        env = load_env()
+        client_id = env.get("YOUTUBE_CLIENT_ID")
+        client_secret = env.get("YOUTUBE_CLIENT_SECRET")
         
         if not client_id or not client_secret:
             logger.error("Thiếu YOUTUBE_CLIENT_ID hoặc YOUTUBE_CLIENT_SECRET trong file .env")
             return False
         
-        # Tạo file tạm thời chứa client_secrets.json
+        # Xóa file bí mật tạm do các phiên bản trước để lại sau khi bị gián đoạn
+        for stale_file in ("client_secrets.json", "get_youtube_token.py"):
+            (TEMP_DIR / stale_file).unlink(missing_ok=True)
+        
+        # Thông tin client OAuth được giữ trong bộ nhớ, không ghi ra đĩa
         client_secrets = {
             "installed": {
                 "client_id": client_id,
@@ -322,88 +545,57 @@ def generate_youtube_tokens():
             }
         }
         
-        temp_client_secrets_file = TEMP_DIR / "client_secrets.json"
-        with open(temp_client_secrets_file, 'w') as f:
-            json.dump(client_secrets, f)
-        
-        # Tạo script tạm thời để lấy token
-        token_script = """
-from google_auth_oauthlib.flow import InstalledAppFlow
-
-SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
-
-flow = InstalledAppFlow.from_client_secrets_file(
-    'temp/client_secrets.json',
-    scopes=SCOPES
-)
-
-credentials = flow.run_local_server(port=8080)
-
-print(f"Access Token: {credentials.token}")
-print(f"Refresh Token: {credentials.refresh_token}")
-"""
+        # Import tại đây vì thư viện có thể vừa được cài bởi check_dependencies
+        from google_auth_oauthlib.flow import InstalledAppFlow
         
-        temp_token_script = TEMP_DIR / "get_youtube_token.py"
-        with open(temp_token_script, 'w') as f:
-            f.write(token_script)
-        
-        # Chạy script để lấy token
+        # Chạy luồng OAuth ngay trong tiến trình hiện tại
         print("\nĐang mở trình duyệt để xác thực với Google...\n")
-        process = subprocess.run(
-            [sys.executable, str(temp_token_script)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=False
+        flow = InstalledAppFlow.from_client_config(
+            client_secrets,
+            scopes=["https://www.googleapis.com/auth/youtube.upload"]
         )
+        credentials = flow.run_local_server(port=8080)
+        refresh_token = credentials.refresh_token
         
-        if process.returncode != 0:
-            logger.error(f"Lỗi khi lấy token: {process.stderr.decode('utf-8')}")
-            return False
-        
-        # Trích xuất refresh token từ output
-        output = process.stdout.decode('utf-8')
-        refresh_token_line = [line for line in output.splitlines() if "Refresh Token:" in line]
-        
-        if not refresh_token_line:
-            logger.error("Không thể trích xuất refresh token từ output")
+        if not refresh_token:
+            logger.error("Không nhận được refresh token từ Google")
             return False
         
-        refresh_token = refresh_token_line[0].split("Refresh Token:")[1].strip()
-        
-        # Cập nhật file .env
-        env_content = ""
-        with open(ENV_FILE, 'r') as f:
-            env_content = f.read()
-        
-        if "YOUTUBE_REFRESH_TOKEN=" in env_content:
-            # Thay thế giá trị token hiện có
-            env_lines = env_content.splitlines()
-            for i, line in enumerate(env_lines):
-                if line.startswith("YOUTUBE_REFRESH_TOKEN="):
-                    env_lines[i] = f"YOUTUBE_REFRESH_TOKEN={refresh_token}"
-                    break
-            env_content = "\n".join(env_lines)
-        else:
-            # Thêm token mới
-            env_content += f"\nYOUTUBE_REFRESH_TOKEN={refresh_token}"
+        # Cập nhật file .env: ghi từng dòng sang file tạm rồi thay thế file gốc
+        import tempfile
+        
+        token_line = f"YOUTUBE_REFRESH_TOKEN={refresh_token}\n"
+        found = False
+        with tempfile.NamedTemporaryFile('w', dir=CREDENTIALS_DIR, delete=False, encoding='utf-8') as tmp:
+            if ENV_FILE.exists():
+                with open(ENV_FILE, 'r', encoding='utf-8') as f:
+                    line = ""
+                    for line in f:
+                        if not found and line.startswith("YOUTUBE_REFRESH_TOKEN="):
+                            tmp.write(token_line)
+                            found = True
+                        else:
+                            tmp.write(line)
+                    
+                    # Bảo đảm token mới nằm trên một dòng riêng
+                    if not found and line and not line.endswith("\n"):
+                        tmp.write("\n")
+            
+            if not found:
+                tmp.write(token_line)
         
-        with open(ENV_FILE, 'w') as f:
-            f.write(env_content)
+        os.replace(tmp.name, ENV_FILE)
         
         # Nạp lại biến môi trường
         os.environ["YOUTUBE_REFRESH_TOKEN"] = refresh_token
         
-        # Xóa file tạm
-        os.remove(temp_client_secrets_file)
-        os.remove(temp_token_script)
-        
         logger.info("Đã tạo và lưu YouTube refresh token thành công")
         print("\n✅ Đã tạo và lưu YouTube refresh token thành công!")
         print(f"Token đã được lưu vào file {ENV_FILE}")
         return True
         
     except Exception as e:
-        logger.error(f"Lỗi khi tạo YouTube token: {str(e)}")
+        logger.error("Lỗi khi tạo YouTube token: %s", e)
         return False
 
 def print_menu():
@@ -419,6 +611,76 @@ def print_menu():
     print("0. Thoát")
     print("============================================================")
 
+def _print_step_menu(title):
+    """
+    Hiển thị danh sách các bước của quy trình.
+    
+    Args:
+        title: Tiêu đề hiển thị phía trên danh sách
+    """
+    print(f"\n{title}")
+    for number, step in enumerate(VALID_STEPS, 1):
+        print(f"{number}. {step} - {STEP_DESCRIPTIONS[step]}")
+
+def _run_specific_step():
+    """
+    Mục 2 của menu: chạy một hoặc nhiều bước cụ thể.
+    """
+    _print_step_menu("Các bước có thể chạy:")
+    
+    step_choice = input("\nNhập tên bước cần chạy (nhiều bước cách nhau bằng dấu phẩy): ")
+    step_list = [step.strip() for step in step_choice.split(",") if step.strip()]
+    
+    if step_list and all(step in VALID_STEP_SET for step in step_list):
+        if len(step_list) == 1:
+            run_step(step_list[0])
+        else:
+            run_steps(step_list)
+    else:
+        print(f"Bước không hợp lệ: {step_choice}")
+
+def _run_custom_range():
+    """
+    Mục 3 của menu: chạy quy trình từ bước bắt đầu đến bước kết thúc.
+    """
+    _print_step_menu("Các bước trong quy trình:")
+    
+    start_step = input("\nNhập bước bắt đầu: ")
+    end_step = input("Nhập bước kết thúc: ")
+    
+    if start_step in VALID_STEP_SET and end_step in VALID_STEP_SET:
+        run_custom_pipeline(start_step, end_step)
+    else:
+        print(f"Bước không hợp lệ: {start_step} hoặc {end_step}")
+
+def _check_environment():
+    """
+    Mục 5 của menu: kiểm tra môi trường và hiển thị kết quả.
+    """
+    print("\nĐang kiểm tra môi trường và cài đặt...")
+    checks = run_environment_checks()
+    
+    print("\n===== Kết quả kiểm tra =====")
+    print(f"Python: {'✅ OK' if checks['python'] else '❌ Không đạt yêu cầu'}")
+    print(f"FFmpeg: {'✅ OK' if checks['ffmpeg'] else '❌ Không tìm thấy'}")
+    print(f"Môi trường: {'✅ OK' if checks['env'] else '❌ Có lỗi'}")
+    print(f"Thư viện: {'✅ OK' if checks['deps'] else '❌ Thiếu thư viện'}")
+    print(f"API Keys: {'✅ OK' if checks['api'] else '❌ Thiếu API key'}")
+    
+    if all(checks.values()):
+        print("\n✅ Tất cả đều sẵn sàng! Bạn có thể chạy hệ thống.")
+    else:
+        print("\n❌ Có một số vấn đề cần khắc phục. Vui lòng xem log để biết thêm chi tiết.")
+
+# Bảng ánh xạ lựa chọn menu -> hàm xử lý ("0" để thoát được xử lý riêng)
+MENU = {
+    "1": lambda: run_step("all"),
+    "2": _run_specific_step,
+    "3": _run_custom_range,
+    "4": generate_youtube_tokens,
+    "5": _check_environment
+}
+
 def interactive_mode():
     """
     Chạy chế độ tương tác với người dùng.
@@ -430,70 +692,10 @@ def interactive_mode():
         if choice == "0":
             print("Tạm biệt!")
             break
-            
-        elif choice == "1":
-            run_step("all")
-            
-        elif choice == "2":
-            print("\nCác bước có thể chạy:")
-            print("1. ideas - Tạo ý tưởng POV")
-            print("2. prompts - Tăng cường prompt")
-            print("3. images - Tạo hình ảnh")
-            print("4. videos - Xử lý video")
-            print("5. audio - Tạo âm thanh")
-            print("6. compose - Ghép video")
-            print("7. publish - Đăng tải YouTube")
-            
-            step_choice = input("\nNhập tên bước cần chạy: ")
-            valid_steps = ["ideas", "prompts", "images", "videos", "audio", "compose", "publish"]
-            
-            if step_choice in valid_steps:
-                run_step(step_choice)
-            else:
-                print(f"Bước không hợp lệ: {step_choice}")
-                
-        elif choice == "3":
-            print("\nCác bước trong quy trình:")
-            print("1. ideas - Tạo ý tưởng POV")
-            print("2. prompts - Tăng cường prompt")
-            print("3. images - Tạo hình ảnh")
-            print("4. videos - Xử lý video")
-            print("5. audio - Tạo âm thanh")
-            print("6. compose - Ghép video")
-            print("7. publish - Đăng tải YouTube")
-            
-            start_step = input("\nNhập bước bắt đầu: ")
-            end_step = input("Nhập bước kết thúc: ")
-            
-            valid_steps = ["ideas", "prompts", "images", "videos", "audio", "compose", "publish"]
-            if start_step in valid_steps and end_step in valid_steps:
-                run_custom_pipeline(start_step, end_step)
-            else:
-                print(f"Bước không hợp lệ: {start_step} hoặc {end_step}")
-                
-        elif choice == "4":
-            generate_youtube_tokens()
-            
-        elif choice == "5":
-            print("\nĐang kiểm tra môi trường và cài đặt...")
-            python_ok = check_python_version()
-            ffmpeg_ok = check_ffmpeg()
-            env_ok = setup_environment()
-            deps_ok = check_dependencies()
-            api_ok = validate_api_keys()
-            
-            print("\n===== Kết quả kiểm tra =====")
-            print(f"Python: {'✅ OK' if python_ok else '❌ Không đạt yêu cầu'}")
-            print(f"FFmpeg: {'✅ OK' if ffmpeg_ok else '❌ Không tìm thấy'}")
-            print(f"Môi trường: {'✅ OK' if env_ok else '❌ Có lỗi'}")
-            print(f"Thư viện: {'✅ OK' if deps_ok else '❌ Thiếu thư viện'}")
-            print(f"API Keys: {'✅ OK' if api_ok else '❌ Thiếu API key'}")
-            
-            if all([python_ok, ffmpeg_ok, env_ok, deps_ok, api_ok]):
-                print("\n✅ Tất cả đều sẵn sàng! Bạn có thể chạy hệ thống.")
-            else:
-                print("\n❌ Có một số vấn đề cần khắc phục. Vui lòng xem log để biết thêm chi tiết.")
-                
+        
+        handler = MENU.get(choice)
+        if handler:
+            handler()
         else:
             print("Lựa chọn không hợp lệ!")
         
@@ -508,9 +710,12 @@ def parse_args():
     """
     parser = argparse.ArgumentParser(description="Hệ thống tạo video POV tự động về Ai Cập cổ đại")
     
-    parser.add_argument("--step", choices=["ideas", "prompts", "images", "videos", "audio", "compose", "publish", "all"],
+    parser.add_argument("--step", choices=ALL_STEPS,
                         help="Chạy một bước cụ thể trong quy trình")
     
+    parser.add_argument("--steps",
+                        help="Chạy nhiều bước cụ thể, phân tách bằng dấu phẩy (ví dụ: images,audio)")
+    
     parser.add_argument("--start", 
                         help="Bước bắt đầu của quy trình (dùng cùng với --end)")
     
@@ -529,14 +734,18 @@ def parse_args():
     parser.add_argument("--interactive", "-i", action="store_true",
                         help="Chạy chế độ tương tác với menu")
     
+    parser.add_argument("--verbose", "-v", action="store_true",
+                        help="Ghi log chi tiết khi kiểm tra môi trường")
+    
     return parser.parse_args()
 
 def main():
     """
     Hàm chính của script.
     """
-    # Tạo thư mục logs nếu chưa tồn tại
-    LOGS_DIR.mkdir(exist_ok=True)
+    # Tạo các thư mục cần thiết (bao gồm logs) nếu chưa tồn tại
+    ensure_dirs()
+    _configure_logging()
     
     args = parse_args()
     
@@ -548,14 +757,10 @@ def main():
         return 0
     
     # Thiết lập môi trường
-    if args.setup or (not any([args.step, args.start, args.end, args.youtube_token])):
-        python_ok = check_python_version()
-        ffmpeg_ok = check_ffmpeg()
-        env_ok = setup_environment()
-        deps_ok = check_dependencies()
-        api_ok = validate_api_keys()
-        
-        if all([python_ok, ffmpeg_ok, env_ok, deps_ok, api_ok]):
+    if args.setup or (not any([args.step, args.steps, args.start, args.end, args.youtube_token])):
+        checks = run_environment_checks(verbose=args.verbose)
+        
+        if all(checks.values()):
             logger.info("Môi trường đã sẵn sàng để chạy hệ thống")
         else:
             logger.error("Có vấn đề với môi trường. Vui lòng kiểm tra log để biết thêm chi tiết")
@@ -566,13 +771,17 @@ def main():
     
     # Tạo YouTube token
     if args.youtube_token:
-        success = generate_youtube_tokens()
+        success = generate_youtube_tokens(skip_prompt=args.yes)
         return 0 if success else 1
     
     # Chạy bước cụ thể
     if args.step:
         return run_step(args.step, skip_prompt=args.yes)
     
+    # Chạy nhiều bước cụ thể
+    if args.steps:
+        return run_steps([step.strip() for step in args.steps.split(",") if step.strip()], skip_prompt=args.yes)
+    
     # Chạy quy trình tùy chỉnh
     if args.start and args.end:
         return run_custom_pipeline(args.start, args.end, skip_prompt=args.yes)
@@ -7,12 +7,15 @@ Sử dụng ElevenLabs API để chuyển đổi văn bản thành giọng nói.
 """
 
 import os
-import base64
-import json
-import time
 import logging
 import requests
 import io
+import wave
+import re
+import shutil
+import functools
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from datetime import datetime
 from typing import List, Dict, Any, Optional
@@ -22,19 +25,15 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from config import settings
 from utils.google_sheets import GoogleSheetsManager
 from utils.google_drive import GoogleDriveManager
+from utils.tts_cache import TTSCache
+from utils.json_utils import load_json, dump_json
+from utils.retry import with_retry
+from utils.rate_limiter import TokenBucket
 from utils.base64_utils import decode_base64_to_bytes
 
 # Thiết lập logging với encoding để hỗ trợ Unicode
 logger = logging.getLogger(__name__)
-log_handler = logging.FileHandler(settings.LOG_FILE, encoding='utf-8')
-console_handler = logging.StreamHandler()
-log_formatter = logging.Formatter(settings.LOG_FORMAT)
-log_handler.setFormatter(log_formatter)
-console_handler.setFormatter(log_formatter)
-
-logger.setLevel(settings.LOG_LEVEL)
-logger.addHandler(log_handler)
-logger.addHandler(console_handler)
+settings.configure_logging()
 # Thêm vào phần imports
 try:
     from gtts import gTTS
@@ -60,6 +59,41 @@ def __init__(self):
     os.makedirs(self.audio_dir, exist_ok=True)
     
     logger.info("AudioGenerator khởi tạo thành công (sử dụng Google TTS)")
+@functools.lru_cache(maxsize=None)
+def _ensure_dir(path: str) -> None:
+    """
+    Tạo thư mục nếu chưa có (chỉ thực hiện một lần cho mỗi đường dẫn trong tiến trình).
+    
+    Args:
+        path: Đường dẫn thư mục
+    """
+    os.makedirs(path, exist_ok=True)
+
+def _split_tts_text(text: str, max_chars: int) -> List[str]:
+    """
+    Chia văn bản thành các đoạn không quá max_chars ký tự, ngắt tại ranh giới câu.
+    
+    Câu dài hơn max_chars được giữ nguyên (gTTS sẽ tự chia nhỏ tiếp).
+    
+    Args:
+        text: Văn bản cần chia
+        max_chars: Độ dài tối đa mỗi đoạn
+        
+    Returns:
+        List[str]: Các đoạn văn bản theo thứ tự
+    """
+    chunks = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?;:])\s+", text.strip()):
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
 class AudioGenerator:
     """
     Lớp tạo âm thanh cho video POV sử dụng ElevenLabs API.
@@ -87,7 +121,27 @@ class AudioGenerator:
         self.audio_dir = os.path.join(self.temp_dir, "audio")
         
         # Đảm bảo thư mục tồn tại
-        os.makedirs(self.audio_dir, exist_ok=True)
+        _ensure_dir(self.audio_dir)
+        
+        # Cache âm thanh đã tạo theo nội dung văn bản; bản sao cục bộ nằm trong temp/tts_cache
+        # (được giữ lại khi dọn thư mục temp, khác với temp/audio)
+        self.tts_cache = TTSCache()
+        self.tts_cache_dir = os.path.join(self.temp_dir, "tts_cache")
+        _ensure_dir(self.tts_cache_dir)
+        
+        # Giới hạn tốc độ dùng chung cho mọi worker để không vượt quota của gTTS và Drive
+        self._tts_limiter = TokenBucket(rate=settings.TTS_RATE_LIMIT, capacity=settings.TTS_RATE_BURST)
+        self._drive_limiter = TokenBucket(rate=settings.DRIVE_RATE_LIMIT, capacity=settings.DRIVE_RATE_BURST)
+        
+        # Backend TTS: Piper chạy model cục bộ, chỉ nạp model một lần
+        self.piper_voice = None
+        if settings.TTS_BACKEND == "piper":
+            from piper import PiperVoice
+            self.piper_voice = PiperVoice.load(settings.PIPER_VOICE_MODEL)
+            self.tts_voice = f"piper:{os.path.basename(settings.PIPER_VOICE_MODEL)}"
+            logger.info(f"Sử dụng Piper TTS cục bộ: {settings.PIPER_VOICE_MODEL}")
+        else:
+            self.tts_voice = settings.TTS_LANGUAGE
         
         logger.info("AudioGenerator initialized successfully")
 
@@ -104,31 +158,51 @@ class AudioGenerator:
         """
         try:
             # Đảm bảo thư viện gTTS đã được cài đặt
-            try:
-                from gtts import gTTS
-            except ImportError:
-                logger.error("Thư viện gTTS chưa được cài đặt. Vui lòng cài đặt: pip install gtts")
-                return None
+            if self.piper_voice is None:
+                try:
+                    from gtts import gTTS
+                except ImportError:
+                    logger.error("Thư viện gTTS chưa được cài đặt. Vui lòng cài đặt: pip install gtts")
+                    return None
+            
+            # Dùng lại âm thanh đã tạo và tải lên cho cùng văn bản
+            cached = self.tts_cache.get(text, self.tts_voice)
+            if cached:
+                logger.info(f"Dùng âm thanh đã cache cho văn bản: '{text[:50]}...'")
+                
+                # Sao chép bản cache về đúng tên file của cảnh này (file cache có thể thuộc cảnh khác)
+                output_path = None
+                if settings.KEEP_LOCAL_AUDIO and cached.get("local_path"):
+                    output_path = os.path.join(self.audio_dir, output_filename)
+                    shutil.copyfile(cached["local_path"], output_path)
+                
+                return {
+                    "filename": output_filename,
+                    "local_path": output_path,
+                    "text": text,
+                    "file_id": cached["file_id"],
+                    "web_content_link": cached.get("web_content_link"),
+                    "cached": True
+                }
     
-            # Đường dẫn đến file đầu ra
-            output_path = os.path.join(self.audio_dir, output_filename)
-            
             logger.info(f"Đang tạo âm thanh cho văn bản: '{text[:50]}...'")
             
-            # Tạo âm thanh từ văn bản
-            tts = gTTS(text=text, lang='en', slow=False)
-            tts.save(output_path)
+            # Tạo âm thanh từ văn bản, giữ nguyên dạng bytes trong bộ nhớ
+            # (mỗi đoạn được thử lại với backoff khi gặp lỗi tạm thời)
+            audio_bytes = self._synthesize(text)
             
-            # Đọc file để chuyển thành base64
-            with open(output_path, "rb") as f:
-                audio_data = f.read()
-                audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+            # Chỉ ghi ra đĩa khi cần giữ bản sao cục bộ
+            output_path = None
+            if settings.KEEP_LOCAL_AUDIO:
+                output_path = os.path.join(self.audio_dir, output_filename)
+                with open(output_path, "wb") as f:
+                    f.write(audio_bytes)
             
             logger.info(f"Đã tạo âm thanh thành công: {output_filename}")
             
             return {
                 "filename": output_filename,
-                "audio_base64": audio_base64,
+                "audio_bytes": audio_bytes,
                 "local_path": output_path,
                 "text": text
             }
@@ -137,6 +211,101 @@ class AudioGenerator:
             logger.error(f"Lỗi khi tạo âm thanh: {str(e)}")
             return None
 
+    def _synthesize_chunk(self, text: str) -> bytes:
+        """
+        Gọi gTTS cho một đoạn văn bản.
+        
+        Args:
+            text: Đoạn văn bản
+            
+        Returns:
+            bytes: Dữ liệu MP3
+        """
+        from gtts import gTTS
+        
+        self._tts_limiter.acquire()
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=settings.TTS_LANGUAGE, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+    
+    def _synthesize_piper(self, text: str) -> bytes:
+        """
+        Chuyển văn bản thành MP3 bằng model Piper cục bộ.
+        
+        Args:
+            text: Văn bản cần chuyển thành âm thanh
+            
+        Returns:
+            bytes: Dữ liệu MP3
+        """
+        from pydub import AudioSegment
+        
+        wav_buffer = io.BytesIO()
+        with wave.open(wav_buffer, "wb") as wav_file:
+            self.piper_voice.synthesize(text, wav_file)
+        wav_buffer.seek(0)
+        
+        # Chuyển WAV sang MP3 (các bước sau dùng audio/mpeg)
+        mp3_buffer = io.BytesIO()
+        AudioSegment.from_wav(wav_buffer).export(mp3_buffer, format="mp3")
+        return mp3_buffer.getvalue()
+    
+    def _synthesize(self, text: str) -> bytes:
+        """
+        Chuyển văn bản thành MP3, các đoạn của văn bản dài được tạo song song.
+        
+        Các frame MPEG có thể nối trực tiếp nên ghép bytes của từng đoạn theo thứ tự
+        cho ra một file MP3 hợp lệ.
+        
+        Args:
+            text: Văn bản cần chuyển thành âm thanh
+            
+        Returns:
+            bytes: Dữ liệu MP3
+        """
+        if self.piper_voice is not None:
+            return self._synthesize_piper(text)
+        
+        chunks = _split_tts_text(text, settings.TTS_CHUNK_CHARS)
+        if len(chunks) <= 1:
+            return with_retry(self._synthesize_chunk, text)
+        # Pool riêng cho các đoạn của văn bản này (tách khỏi pool xử lý cảnh để tránh deadlock)
+        with ThreadPoolExecutor(max_workers=min(settings.TTS_CHUNK_WORKERS, len(chunks))) as executor:
+            return b"".join(executor.map(lambda chunk: with_retry(self._synthesize_chunk, chunk), chunks))
+    
+    def _cached_audio_path(self, text: str) -> str:
+        """
+        Đường dẫn bản sao cục bộ của âm thanh đã cache cho một văn bản.
+        
+        Args:
+            text: Văn bản đã chuyển thành âm thanh
+            
+        Returns:
+            str: Đường dẫn file trong temp/tts_cache
+        """
+        return os.path.join(self.tts_cache_dir, f"{self.tts_cache.make_key(text, self.tts_voice)}.mp3")
+    
+    def _store_cached_audio(self, text: str, local_path: Optional[str]) -> Optional[str]:
+        """
+        Sao chép file âm thanh vào thư mục cache để dùng lại sau khi temp/audio bị dọn.
+        
+        Args:
+            text: Văn bản đã chuyển thành âm thanh
+            local_path: File âm thanh vừa tạo (None nếu không giữ bản sao cục bộ)
+            
+        Returns:
+            str: Đường dẫn bản sao trong cache, hoặc None nếu không có
+        """
+        if not local_path:
+            return None
+        try:
+            cache_path = self._cached_audio_path(text)
+            shutil.copyfile(local_path, cache_path)
+            return cache_path
+        except OSError as e:
+            logger.warning(f"Could not copy audio into cache: {str(e)}")
+            return None
+    
     def upload_to_drive(self, audio_info: Dict[str, Any]) -> Dict[str, Any]:
         """
         Tải file âm thanh lên Google Drive và thiết lập quyền chia sẻ.
@@ -148,9 +317,20 @@ class AudioGenerator:
             audio_info đã cập nhật với thông tin từ Google Drive
         """
         try:
+            # Âm thanh lấy từ cache đã có sẵn trên Google Drive
+            if audio_info.get("cached"):
+                audio_info.update({
+                    "drive_upload_success": True,
+                    "drive_folder_id": self.drive_folder_id
+                })
+                logger.info(f"Audio already on Google Drive (cached): {audio_info.get('web_content_link')}")
+                return audio_info
+            
             # Tải lên Google Drive và chỉ định thư mục đích
-            file_id = self.drive_manager.upload_from_base64(
-                base64_data=audio_info["audio_base64"],
+            self._drive_limiter.acquire()
+            # (bytes được lấy ra khỏi audio_info vì kết quả sẽ được ghi ra JSON)
+            file_id = self.drive_manager.upload_from_bytes(
+                data=audio_info.pop("audio_bytes"),
                 filename=audio_info["filename"],
                 mime_type="audio/mpeg",
                 parent_folder_id=self.drive_folder_id  # Thêm ID thư mục đích
@@ -161,16 +341,14 @@ class AudioGenerator:
                 audio_info["drive_upload_success"] = False
                 return audio_info
             
-            # Thiết lập quyền chia sẻ công khai
-            sharing_success = self.drive_manager.share_file(
+            # Thiết lập quyền chia sẻ công khai và lấy link truy cập trực tiếp (một batch request)
+            self._drive_limiter.acquire()
+            sharing_success, web_content_link = self.drive_manager.share_and_get_link(
                 file_id=file_id,
                 role="reader",
                 type="anyone"
             )
             
-            # Lấy link truy cập trực tiếp
-            web_content_link = self.drive_manager.get_web_content_link(file_id)
-            
             # Cập nhật thông tin âm thanh
             audio_info.update({
                 "file_id": file_id,
@@ -180,6 +358,13 @@ class AudioGenerator:
                 "drive_folder_id": self.drive_folder_id  # Lưu ID thư mục để tham khảo
             })
             
+            # Lưu vào cache để lần chạy sau không phải tạo và tải lên lại
+            self.tts_cache.put(audio_info["text"], self.tts_voice, {
+                "file_id": file_id,
+                "web_content_link": web_content_link,
+                "local_path": self._store_cached_audio(audio_info["text"], audio_info.get("local_path"))
+            })
+            
             logger.info(f"Audio uploaded to Google Drive successfully: {web_content_link}")
             return audio_info
             
@@ -200,26 +385,90 @@ class AudioGenerator:
             # Đường dẫn file kết quả từ scene_prompt_enhancer
             input_file = os.path.join(settings.TEMP_DIR, "enhanced_scene_prompts.json")
             
-            # Kiểm tra file tồn tại
-            if os.path.exists(input_file):
-                with open(input_file, 'r', encoding='utf-8') as f:
-                    enhanced_data = json.load(f)
-                    
-                if enhanced_data and "enhanced_scenes" in enhanced_data:
-                    scene_count = len(enhanced_data["enhanced_scenes"])
-                    logger.info(f"Loaded {scene_count} enhanced scenes from file")
-                    return enhanced_data
-                else:
-                    logger.warning("Enhanced scenes file exists but contains no valid scene data")
-                    return {}
-            else:
+            # Đọc trực tiếp, file không tồn tại được xử lý qua FileNotFoundError
+            try:
+                enhanced_data = load_json(input_file)
+            except FileNotFoundError:
                 logger.warning(f"Enhanced scenes file not found: {input_file}")
                 return {}
                 
+            if enhanced_data and "enhanced_scenes" in enhanced_data:
+                scene_count = len(enhanced_data["enhanced_scenes"])
+                logger.info(f"Loaded {scene_count} enhanced scenes from file")
+                return enhanced_data
+            else:
+                logger.warning("Enhanced scenes file exists but contains no valid scene data")
+                return {}
+                
         except Exception as e:
             logger.error(f"Error loading enhanced scenes: {str(e)}")
             return {}
     
+    def _run_concurrently(self, func, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Chạy func(index, item) cho từng phần tử trên thread pool.
+        
+        Args:
+            func: Hàm xử lý một phần tử, nhận (index bắt đầu từ 1, phần tử)
+            items: Danh sách phần tử cần xử lý
+            
+        Returns:
+            List[Dict]: Kết quả theo đúng thứ tự của items
+        """
+        results = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=settings.AUDIO_WORKERS) as executor:
+            futures = {executor.submit(func, i + 1, item): i for i, item in enumerate(items)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        return results
+    
+    def _process_one_scene(self, scene_index: int, scene_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Tạo và tải lên âm thanh cho một cảnh đã tăng cường.
+        
+        Args:
+            scene_index: Số thứ tự cảnh (bắt đầu từ 1)
+            scene_data: Dữ liệu cảnh đã tăng cường
+            
+        Returns:
+            Dict: Kết quả xử lý âm thanh của cảnh
+        """
+        logger.info(f"Processing audio for scene {scene_index}")
+        
+        # Lấy prompt đã tăng cường
+        enhanced_prompt = scene_data.get("enhanced_prompt", "")
+        original_scene = scene_data.get("original_scene", "")
+        
+        if not enhanced_prompt:
+            logger.warning(f"No enhanced prompt found for scene {scene_index}, using original scene")
+            enhanced_prompt = original_scene
+        
+        # Tạo tên file đầu ra
+        filename = settings.audio_filename(scene_index)
+        
+        # Tạo âm thanh (generate_audio tự thử lại các lỗi tạm thời)
+        audio_info = self.generate_audio(enhanced_prompt, filename)
+        
+        if not audio_info:
+            return {
+                "scene_index": scene_index,
+                "original_scene": original_scene,
+                "enhanced_prompt": enhanced_prompt,
+                "success": False,
+                "error": "Failed to create audio after multiple attempts"
+            }
+        
+        # Thêm thông tin cảnh
+        audio_info["scene_index"] = scene_index
+        audio_info["original_scene"] = original_scene
+        audio_info["enhanced_prompt"] = enhanced_prompt
+        
+        # Tải lên Google Drive
+        audio_info = self.upload_to_drive(audio_info)
+        audio_info["success"] = True
+        
+        return audio_info
+    
     def process_enhanced_scenes(self) -> List[Dict[str, Any]]:
         """
         Xử lý các cảnh đã tăng cường để tạo âm thanh.
@@ -238,62 +487,41 @@ class AudioGenerator:
         
         logger.info(f"Processing audio for {len(enhanced_scenes)} enhanced scenes")
         
-        # Xử lý từng cảnh
-        results = []
+        # Gom các cảnh có cùng văn bản để chỉ tạo và tải lên âm thanh một lần
+        text_to_indices: Dict[str, List[int]] = defaultdict(list)
         for i, scene_data in enumerate(enhanced_scenes):
-            logger.info(f"Processing audio for scene {i+1}/{len(enhanced_scenes)}")
-            
-            # Lấy prompt đã tăng cường
-            enhanced_prompt = scene_data.get("enhanced_prompt", "")
-            original_scene = scene_data.get("original_scene", "")
-            
-            if not enhanced_prompt:
-                logger.warning(f"No enhanced prompt found for scene {i+1}, using original scene")
-                enhanced_prompt = original_scene
-            
-            # Tạo tên file đầu ra
-            filename = settings.AUDIO_FILENAME_TEMPLATE.format(index=i+1)
-            
-            # Tạo âm thanh với cơ chế thử lại
-            audio_info = None
-            for attempt in range(settings.MAX_RETRIES):
-                audio_info = self.generate_audio(enhanced_prompt, filename)
-                
-                if audio_info:
-                    break
-                    
-                logger.warning(f"Retrying audio creation (attempt {attempt+1}/{settings.MAX_RETRIES})")
-                time.sleep(settings.RETRY_DELAY)
-            
-            if not audio_info:
-                results.append({
-                    "scene_index": i+1,
-                    "original_scene": original_scene,
-                    "enhanced_prompt": enhanced_prompt,
-                    "success": False,
-                    "error": "Failed to create audio after multiple attempts"
-                })
-                continue
-            
-            # Thêm thông tin cảnh
-            audio_info["scene_index"] = i+1
-            audio_info["original_scene"] = original_scene
-            audio_info["enhanced_prompt"] = enhanced_prompt
-            
-            # Tải lên Google Drive
-            audio_info = self.upload_to_drive(audio_info)
-            audio_info["success"] = True
-            
-            results.append(audio_info)
-            
-            # Thêm độ trễ giữa các lần gọi API
-            if i < len(enhanced_scenes) - 1:
-                time.sleep(1)
+            text = scene_data.get("enhanced_prompt") or scene_data.get("original_scene", "")
+            text_to_indices[text].append(i)
+        
+        groups = list(text_to_indices.values())
+        if len(groups) < len(enhanced_scenes):
+            logger.info(f"Found {len(groups)} unique texts across {len(enhanced_scenes)} scenes")
+        
+        # Xử lý song song các văn bản duy nhất, giữ nguyên thứ tự kết quả
+        unique_results = self._run_concurrently(
+            lambda _, indices: self._process_one_scene(indices[0] + 1, enhanced_scenes[indices[0]]),
+            groups
+        )
+        
+        # Phân phối kết quả cho các cảnh trùng văn bản (dùng chung file trên Drive)
+        results = [None] * len(enhanced_scenes)
+        for indices, audio_info in zip(groups, unique_results):
+            results[indices[0]] = audio_info
+            for i in indices[1:]:
+                duplicate = dict(audio_info)
+                duplicate["scene_index"] = i + 1
+                duplicate["original_scene"] = enhanced_scenes[i].get("original_scene", "")
+                duplicate["filename"] = settings.audio_filename(i + 1)
+                duplicate["duplicate_of"] = indices[0] + 1
+                if audio_info.get("local_path"):
+                    # Mỗi cảnh có file cục bộ riêng theo tên file của cảnh đó
+                    duplicate["local_path"] = os.path.join(self.audio_dir, duplicate["filename"])
+                    shutil.copyfile(audio_info["local_path"], duplicate["local_path"])
+                results[i] = duplicate
         
         # Lưu kết quả vào file
         output_file = os.path.join(self.temp_dir, "enhanced_audio_results.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        dump_json(results, output_file)
         
         # Tổng kết
         success_count = sum(1 for r in results if r.get("success", False))
@@ -316,24 +544,18 @@ class AudioGenerator:
             Dict với kết quả xử lý âm thanh
         """
         try:
+            logger.info(f"Processing audio for idea {index} (ID: {idea.get('ID')})")
+            
             # Lấy caption hoặc sử dụng văn bản ý tưởng thay thế
             text = idea.get("Caption", "")
             if not text:
                 text = idea.get("Idea", "").replace("POV:", "")
             
             # Tạo tên file đầu ra
-            filename = settings.AUDIO_FILENAME_TEMPLATE.format(index=index)
+            filename = settings.audio_filename(index)
             
-            # Tạo âm thanh với cơ chế thử lại
-            audio_info = None
-            for attempt in range(settings.MAX_RETRIES):
-                try:
-                    audio_info = self.generate_audio(text, filename)
-                    if audio_info:
-                        break
-                except Exception as e:
-                    logger.warning(f"Lỗi khi tạo âm thanh (lần thử {attempt+1}): {str(e)}")
-                    time.sleep(settings.RETRY_DELAY)
+            # Tạo âm thanh (generate_audio tự thử lại các lỗi tạm thời)
+            audio_info = self.generate_audio(text, filename)
             
             if not audio_info:
                 return {
@@ -400,21 +622,12 @@ class AudioGenerator:
         
         logger.info(f"Processing audio for {len(ideas)} POV ideas")
         
-        # Xử lý từng ý tưởng
-        results = []
-        for i, idea in enumerate(ideas):
-            logger.info(f"Processing audio for idea {i+1}/{len(ideas)} (ID: {idea.get('ID')})")
-            result = self.process_idea(idea, i+1)
-            results.append(result)
-            
-            # Thêm độ trễ nhỏ giữa các lần gọi API
-            if i < len(ideas) - 1:
-                time.sleep(1)
+        # Xử lý song song các ý tưởng, giữ nguyên thứ tự kết quả
+        results = self._run_concurrently(lambda index, idea: self.process_idea(idea, index), ideas)
         
         # Lưu kết quả vào file
         output_file = os.path.join(self.temp_dir, "audio_results.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        dump_json(results, output_file)
         
         # Tổng kết
         success_count = sum(1 for r in results if r.get("success", False))
@@ -7,8 +7,9 @@ Sử dụng Gemini API để tạo ý tưởng sáng tạo, sau đó lưu vào G
 """
 
 import os
+import io
+import csv
 import sys
-import json
 import time
 import logging
 import random
@@ -24,18 +25,11 @@ import google.generativeai as genai
 # Import các module nội bộ
 from config import settings, prompt_templates
 from utils.google_sheets import GoogleSheetsManager
+from utils.json_utils import dump_json
 
 # Thiết lập logging với UTF-8 encoding để hỗ trợ tiếng Việt
 logger = logging.getLogger(__name__)
-log_handler = logging.FileHandler(settings.LOG_FILE, encoding='utf-8')
-console_handler = logging.StreamHandler(sys.stdout)  # Sử dụng stdout trực tiếp
-log_formatter = logging.Formatter(settings.LOG_FORMAT)
-log_handler.setFormatter(log_formatter)
-console_handler.setFormatter(log_formatter)
-
-logger.setLevel(settings.LOG_LEVEL)
-logger.addHandler(log_handler)
-logger.addHandler(console_handler)
+settings.configure_logging()
 
 class IdeaGenerator:
     """
@@ -53,6 +47,10 @@ class IdeaGenerator:
         if settings.GEMINI_API_KEY:
             genai.configure(api_key=settings.GEMINI_API_KEY)
             self.gemini_available = True
+            
+            # Tạo model và prompt một lần, dùng lại cho mọi lần gọi
+            self.model = genai.GenerativeModel('gemini-2.0-flash-thinking-exp-01-21')
+            self.prompt = prompt_templates.GENERATE_POV_IDEAS_PROMPT
         else:
             logger.warning("Khong tim thay GEMINI_API_KEY. Mot so chuc nang co the khong hoat dong.")
             self.gemini_available = False
@@ -72,15 +70,9 @@ class IdeaGenerator:
             return []
         
         try:
-            # Tạo prompt với số lượng ý tưởng cần thiết
-            prompt = prompt_templates.GENERATE_POV_IDEAS_PROMPT
-            
-            # Chọn model
-            model = genai.GenerativeModel('gemini-2.0-flash-thinking-exp-01-21')
-            
             # Gọi API
             logger.info(f"Dang tao {count} y tuong POV voi Gemini API")
-            response = model.generate_content(prompt)
+            response = self.model.generate_content(self.prompt)
             
             if not response.text:
                 logger.error("Khong nhan duoc phan hoi tu Gemini API")
@@ -93,15 +85,10 @@ class IdeaGenerator:
             if len(ideas) > count:
                 ideas = ideas[:count]
             
-            # Lấy ID tiếp theo từ Google Sheets
-            try:
-                next_id = self.sheets_manager.get_next_available_id()
-            except:
-                next_id = 1  # Default nếu không lấy được từ Sheets
-            
-            # Cập nhật ID cho các ý tưởng
-            for i, idea in enumerate(ideas):
-                idea["ID"] = str(next_id + i)
+            # Chưa có ID cho đến khi ghi vào Google Sheets (append_new_ideas đọc sheet một lần
+            # và gán ID thực tế); để trống để không trùng với ID của các dòng đã có trong sheet
+            for idea in ideas:
+                idea["ID"] = ""
             
             logger.info(f"Da tao {len(ideas)} y tuong POV voi Gemini API")
             return ideas
@@ -126,26 +113,21 @@ class IdeaGenerator:
             # In ra phản hồi đầy đủ để debug
             logger.debug(f"Phan hoi API: {response_text}")
             
-            # Xử lý escape sequences
+            # Xử lý escape sequences, sau đó phân tích các dòng phân tách bằng tab
+            # trong một lượt bằng csv.reader (cài đặt bằng C)
             processed_text = response_text.replace('\\t', '\t')
+            reader = csv.reader(io.StringIO(processed_text.strip()), delimiter='\t', quoting=csv.QUOTE_NONE)
             
-            # Phân tích từng dòng
-            lines = processed_text.strip().split('\n')
-            
-            for i, line in enumerate(lines):
+            for i, fields in enumerate(reader):
                 # Bỏ qua dòng trống
-                if not line.strip():
+                if not any(field.strip() for field in fields):
                     continue
                 
-                # Phân tách theo tab thực sự
-                fields = line.split('\t')
-                
                 # Kiểm tra số trường
                 if len(fields) < 7:
-                    logger.warning(f"Dong {i+1} khong du truong ({len(fields)}/7): {line}")
+                    logger.warning(f"Dong {i+1} khong du truong ({len(fields)}/7): {fields}")
                     # Đảm bảo có đủ 7 trường
-                    while len(fields) < 7:
-                        fields.append("")
+                    fields = fields + [""] * (7 - len(fields))
                 
                 # Tạo ý tưởng
                 idea = {
@@ -263,19 +245,19 @@ class IdeaGenerator:
         success = self.save_ideas_to_sheets(ideas)
         
         if not success:
-            logger.warning("Y tuong da duoc tao nhung khong the luu vao Google Sheets")
+            logger.warning(f"Y tuong da duoc tao nhung khong the luu vao Google Sheets: {len(ideas)} y tuong chua co ID")
         
-        # Lưu kết quả vào file tạm thời
-        try:
-            # Đảm bảo thư mục temp tồn tại
-            os.makedirs(settings.TEMP_DIR, exist_ok=True)
-            
-            output_file = os.path.join(settings.TEMP_DIR, "idea_results.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(ideas, f, ensure_ascii=False, indent=2)
-            logger.info(f"Da luu ket qua vao file: {output_file}")
-        except Exception as e:
-            logger.error(f"Khong the luu ket qua vao file tam thoi: {str(e)}")
+        # Lưu kết quả vào file tạm thời (chỉ để tra cứu, không bước nào đọc lại)
+        if settings.PERSIST_INTERMEDIATE_RESULTS:
+            try:
+                # Đảm bảo thư mục temp tồn tại
+                os.makedirs(settings.TEMP_DIR, exist_ok=True)
+                
+                output_file = os.path.join(settings.TEMP_DIR, "idea_results.json")
+                dump_json(ideas, output_file)
+                logger.info(f"Da luu ket qua vao file: {output_file}")
+            except Exception as e:
+                logger.error(f"Khong the luu ket qua vao file tam thoi: {str(e)}")
         
         return ideas
 
@@ -7,11 +7,12 @@ Sử dụng Pollinations.ai API để tạo hình ảnh từ prompt, sau đó l
 """
 
 import os
-import json
-import time
-import base64
+from collections import defaultdict
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
 from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 import sys
@@ -21,18 +22,14 @@ from config import settings, prompt_templates
 from utils.google_sheets import GoogleSheetsManager
 from utils.google_drive import GoogleDriveManager
 from utils.base64_utils import save_base64_to_file
+from utils.rate_limiter import TokenBucket
+from utils.media_cache import MediaCache
+from utils.json_utils import load_json, dump_json
+from utils.retry import is_retryable, sleep_before_retry
 
 # Thiết lập logging
 logger = logging.getLogger(__name__)
-log_handler = logging.FileHandler(settings.LOG_FILE, encoding='utf-8')
-console_handler = logging.StreamHandler()
-log_formatter = logging.Formatter(settings.LOG_FORMAT)
-log_handler.setFormatter(log_formatter)
-console_handler.setFormatter(log_formatter)
-
-logger.setLevel(settings.LOG_LEVEL)
-logger.addHandler(log_handler)
-logger.addHandler(console_handler)
+settings.configure_logging()
 
 class ImageGenerator:
     """
@@ -49,6 +46,7 @@ class ImageGenerator:
         
         # Lấy thông tin cấu hình
         self.pollinations_url = settings.POLLINATIONS_URL
+        self.pollinations_url_template = settings.POLLINATIONS_URL_TEMPLATE
         self.image_width = settings.POLLINATIONS_IMAGE_WIDTH
         self.image_height = settings.POLLINATIONS_IMAGE_HEIGHT
         self.model = settings.POLLINATIONS_MODEL
@@ -56,6 +54,38 @@ class ImageGenerator:
         self.nologo = settings.POLLINATIONS_NO_LOGO
         # ID thư mục Google Drive để lưu ảnh
         self.drive_folder_id = "1oFc-Wby1Gm5GKwr1Eygg4zzVfIqIlo0Y"
+        # Session dùng chung giữ kết nối keep-alive tới Pollinations, mỗi worker một kết nối
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.IMAGE_WORKERS
+        ))
+        # Pollinations trả về ảnh cho request GET không có body
+        self.session.headers.update({"Accept": "image/png,image/*;q=0.9"})
+        # Giới hạn tốc độ gọi Pollinations dùng chung cho mọi worker
+        self._pollinations_limiter = TokenBucket(
+            rate=settings.POLLINATIONS_RATE_LIMIT,
+            capacity=settings.POLLINATIONS_RATE_BURST
+        )
+        # Thư mục lưu ảnh tạm thời
+        self.images_dir = os.path.join(settings.TEMP_DIR, "images")
+        
+        # Cache ảnh đã tạo theo (prompt, tham số tạo ảnh); ảnh được lưu theo hash nên không bị
+        # ảnh của lần chạy sau ghi đè
+        self.image_cache = None
+        self.image_cache_dir = os.path.join(settings.TEMP_DIR, "image_cache")
+        self.image_variant = f"{self.model}|{self.image_width}x{self.image_height}|{self.seed}|{self.nologo}"
+        if settings.IMAGE_CACHE_ENABLED:
+            os.makedirs(self.image_cache_dir, exist_ok=True)
+            self.image_cache = MediaCache(
+                os.path.join(settings.TEMP_DIR, "image_cache.json"),
+                max_age=settings.IMAGE_CACHE_MAX_AGE
+            )
+        # Gọi Drive một lần khi khởi tạo: lấy access token (dùng chung cho mọi worker) và kiểm tra
+        # thư mục đích, để lần tải lên đầu tiên không phải chờ xác thực
+        self.drive_folder_info = self.drive_manager.get_file_info(self.drive_folder_id)
+        if not self.drive_folder_info:
+            logger.warning(f"Khong the truy cap thu muc Google Drive: {self.drive_folder_id}")
         logger.info("Khoi tao ImageGenerator thanh cong")
     
     def generate_image_from_prompt(self, prompt: str, index: int = 0) -> Dict[str, Any]:
@@ -70,50 +100,49 @@ class ImageGenerator:
             Dict: Thông tin về hình ảnh đã tạo
         """
         try:
-            # Mã hóa URL và tạo URL API
-            # Dùng URL nguyên bản thay vì mã hóa vì Pollinations API đã xử lý
-            url = self.pollinations_url.format(prompt=prompt)
-            
-            # Thiết lập tham số query
-            params = {
-                "width": self.image_width,
-                "height": self.image_height,
-                "model": self.model,
-                "seed": self.seed,
-                "nologo": self.nologo
-            }
-            
-            # Thiết lập headers
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
+            # Tạo URL API: chỉ mã hóa prompt, phần query cố định đã được mã hóa sẵn trong settings
+            url = self.pollinations_url_template.format(prompt=quote(prompt, safe=''))
             
             # Tạo tên file
-            filename = settings.IMAGE_FILENAME_TEMPLATE.format(index=index)
-            local_path = os.path.join(settings.TEMP_DIR, "images", filename)
+            filename = settings.image_filename(index)
+            local_path = os.path.join(self.images_dir, filename)
+            
+            if self.image_cache is not None:
+                # Dùng lại ảnh đã tạo và tải lên cho cùng prompt
+                cached = self.image_cache.get(prompt, self.image_variant)
+                if cached:
+                    logger.info(f"Dung hinh anh da cache cho prompt: '{prompt[:50]}...'")
+                    return {
+                        "prompt": prompt,
+                        "filename": filename,
+                        "local_path": cached["local_path"],
+                        "file_id": cached["file_id"],
+                        "web_content_link": cached.get("web_content_link"),
+                        "cached": True,
+                        "success": True
+                    }
+                local_path = os.path.join(
+                    self.image_cache_dir, f"{MediaCache.make_key(prompt, self.image_variant)}.png"
+                )
             
             logger.info(f"Dang tao hinh anh cho prompt: '{prompt[:50]}...'")
             
             # Gọi API với cơ chế retry
             for attempt in range(settings.MAX_RETRIES):
                 try:
-                    response = requests.get(
+                    self._pollinations_limiter.acquire()
+                    with self.session.get(
                         url,
-                        params=params,
-                        headers=headers,
-                        timeout=settings.API_TIMEOUT
-                    )
-                    
-                    # Kiểm tra lỗi
-                    response.raise_for_status()
-                    
-                    # Lưu hình ảnh vào file tạm thời
-                    with open(local_path, 'wb') as f:
-                        f.write(response.content)
-                    
-                    # Mã hóa hình ảnh thành base64 để tiện xử lý
-                    image_base64 = base64.b64encode(response.content).decode('utf-8')
+                        timeout=settings.API_TIMEOUT,
+                        stream=True
+                    ) as response:
+                        # Kiểm tra lỗi
+                        response.raise_for_status()
+                        
+                        # Ghi thẳng hình ảnh vào file tạm thời theo từng khối, không giữ cả ảnh trong bộ nhớ
+                        with open(local_path, 'wb') as f:
+                            for chunk in response.iter_content(chunk_size=settings.IMAGE_DOWNLOAD_CHUNK_SIZE):
+                                f.write(chunk)
                     
                     logger.info(f"Da tao hinh anh thanh cong: {filename}")
                     
@@ -122,16 +151,15 @@ class ImageGenerator:
                         "prompt": prompt,
                         "filename": filename,
                         "local_path": local_path,
-                        "image_base64": image_base64,
                         "success": True
                     }
                 
                 except requests.exceptions.RequestException as e:
-                    if attempt < settings.MAX_RETRIES - 1:
+                    if attempt < settings.MAX_RETRIES - 1 and is_retryable(e):
                         logger.warning(f"Loi khi tao hinh anh (lan thu {attempt+1}/{settings.MAX_RETRIES}): {str(e)}")
-                        time.sleep(settings.RETRY_DELAY)
+                        sleep_before_retry(attempt, e)
                     else:
-                        logger.error(f"Khong the tao hinh anh sau {settings.MAX_RETRIES} lan thu: {str(e)}")
+                        logger.error(f"Khong the tao hinh anh sau {attempt+1} lan thu: {str(e)}")
                         return {
                             "prompt": prompt,
                             "success": False,
@@ -159,13 +187,23 @@ class ImageGenerator:
         try:
             if not image_info.get("success", False):
                 return image_info
+            
+            # Ảnh lấy từ cache đã có sẵn trên Google Drive
+            if image_info.get("cached"):
+                image_info.update({
+                    "shared": True,
+                    "drive_upload_success": True,
+                    "drive_folder_id": self.drive_folder_id
+                })
+                logger.info(f"Hinh anh da co tren Google Drive (cache): {image_info.get('web_content_link')}")
+                return image_info
                 
-            # Tải lên Google Drive và chỉ định thư mục đích
-            file_id = self.drive_manager.upload_from_base64(
-                base64_data=image_info["image_base64"],
+            # Tải lên Google Drive từ file đã lưu và chỉ định thư mục đích
+            file_id = self.drive_manager.upload_file(
+                file_path=image_info["local_path"],
                 filename=image_info["filename"],
                 mime_type="image/png",
-                parent_folder_id=self.drive_folder_id  # Thêm ID thư mục đích
+                folder_id=self.drive_folder_id  # Thêm ID thư mục đích
             )
             
             if not file_id:
@@ -173,16 +211,13 @@ class ImageGenerator:
                 image_info["drive_upload_success"] = False
                 return image_info
             
-            # Thiết lập quyền chia sẻ công khai
-            sharing_success = self.drive_manager.share_file(
+            # Thiết lập quyền chia sẻ công khai và lấy link truy cập trực tiếp (một batch request)
+            sharing_success, web_content_link = self.drive_manager.share_and_get_link(
                 file_id=file_id,
                 role="reader",
                 type="anyone"
             )
             
-            # Lấy link truy cập trực tiếp
-            web_content_link = self.drive_manager.get_web_content_link(file_id)
-            
             # Cập nhật thông tin hình ảnh
             image_info.update({
                 "file_id": file_id,
@@ -192,6 +227,14 @@ class ImageGenerator:
                 "drive_folder_id": self.drive_folder_id  # Lưu ID thư mục để tham khảo
             })
             
+            # Chỉ cache ảnh đã chia sẻ được, để lần sau dùng lại link công khai
+            if self.image_cache is not None and sharing_success and web_content_link:
+                self.image_cache.put(image_info["prompt"], self.image_variant, {
+                    "file_id": file_id,
+                    "web_content_link": web_content_link,
+                    "local_path": image_info["local_path"]
+                })
+            
             logger.info(f"Da tai len va chia se hinh anh vao thu muc Google Drive: {web_content_link}")
             return image_info
             
@@ -212,22 +255,21 @@ class ImageGenerator:
             # Đường dẫn file kết quả từ scene_prompt_enhancer
             input_file = os.path.join(settings.TEMP_DIR, "enhanced_scene_prompts.json")
             
-            # Kiểm tra file tồn tại
-            if os.path.exists(input_file):
-                with open(input_file, 'r', encoding='utf-8') as f:
-                    enhanced_data = json.load(f)
-                    
-                if enhanced_data and "enhanced_scenes" in enhanced_data and len(enhanced_data["enhanced_scenes"]) > 0:
-                    scene_count = len(enhanced_data["enhanced_scenes"])
-                    logger.info(f"Da doc {scene_count} canh tang cuong tu file")
-                    return enhanced_data
-                else:
-                    logger.warning("File enhanced_scene_prompts.json ton tai nhung khong co du lieu canh hop le")
-                    return {}
-            else:
+            # Đọc trực tiếp, file không tồn tại được xử lý qua FileNotFoundError
+            try:
+                enhanced_data = load_json(input_file)
+            except FileNotFoundError:
                 logger.warning(f"Khong tim thay file canh da tang cuong: {input_file}")
                 return {}
                 
+            if enhanced_data and "enhanced_scenes" in enhanced_data and len(enhanced_data["enhanced_scenes"]) > 0:
+                scene_count = len(enhanced_data["enhanced_scenes"])
+                logger.info(f"Da doc {scene_count} canh tang cuong tu file")
+                return enhanced_data
+            else:
+                logger.warning("File enhanced_scene_prompts.json ton tai nhung khong co du lieu canh hop le")
+                return {}
+                
         except Exception as e:
             logger.error(f"Loi khi doc file canh da tang cuong: {str(e)}")
             return {}
@@ -243,35 +285,34 @@ class ImageGenerator:
             # Đường dẫn file
             input_file = os.path.join(settings.TEMP_DIR, "scene_sequences.json")
             
-            # Kiểm tra file tồn tại
-            if os.path.exists(input_file):
-                with open(input_file, 'r', encoding='utf-8') as f:
-                    scene_data = json.load(f)
-                    
-                if scene_data and "scenes" in scene_data and len(scene_data["scenes"]) > 0:
-                    scene_count = len(scene_data["scenes"])
-                    logger.info(f"Da doc {scene_count} canh tu file scene_sequences.json")
-                    
-                    # Chuyển đổi định dạng để tương thích với cấu trúc cảnh đã tăng cường
-                    enhanced_data = {
-                        "ID": scene_data.get("ID"),
-                        "Idea": scene_data.get("Idea", ""),
-                        "Environment_Prompt": scene_data.get("Environment_Prompt", ""),
-                        "enhanced_scenes": [
-                            {
-                                "original_scene": scene,
-                                "enhanced_prompt": scene
-                            } for scene in scene_data.get("scenes", [])
-                        ]
-                    }
-                    return enhanced_data
-                else:
-                    logger.warning("File scene_sequences.json ton tai nhung khong co du lieu canh hop le")
-                    return {}
-            else:
+            # Đọc trực tiếp, file không tồn tại được xử lý qua FileNotFoundError
+            try:
+                scene_data = load_json(input_file)
+            except FileNotFoundError:
                 logger.warning(f"Khong tim thay file chuoi canh: {input_file}")
                 return {}
                 
+            if scene_data and "scenes" in scene_data and len(scene_data["scenes"]) > 0:
+                scene_count = len(scene_data["scenes"])
+                logger.info(f"Da doc {scene_count} canh tu file scene_sequences.json")
+                
+                # Chuyển đổi định dạng để tương thích với cấu trúc cảnh đã tăng cường
+                enhanced_data = {
+                    "ID": scene_data.get("ID"),
+                    "Idea": scene_data.get("Idea", ""),
+                    "Environment_Prompt": scene_data.get("Environment_Prompt", ""),
+                    "enhanced_scenes": [
+                        {
+                            "original_scene": scene,
+                            "enhanced_prompt": scene
+                        } for scene in scene_data.get("scenes", [])
+                    ]
+                }
+                return enhanced_data
+            else:
+                logger.warning("File scene_sequences.json ton tai nhung khong co du lieu canh hop le")
+                return {}
+                
         except Exception as e:
             logger.error(f"Loi khi doc file chuoi canh: {str(e)}")
             return {}
@@ -298,6 +339,41 @@ class ImageGenerator:
             logger.error(f"Loi khi lay y tuong tu Google Sheets: {str(e)}")
             return []
     
+    def _generate_scene_image(self, scene_index: int, scene_data: Dict[str, Any],
+                              base_idea: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Tạo hình ảnh cho một cảnh đã tăng cường (chưa tải lên Google Drive).
+        
+        Args:
+            scene_index: Số thứ tự cảnh (bắt đầu từ 1)
+            scene_data: Dữ liệu cảnh đã tăng cường
+            base_idea: Thông tin ý tưởng gốc (ID, Idea, Environment_Prompt)
+            
+        Returns:
+            Dict: Kết quả xử lý hình ảnh của cảnh, None nếu cảnh không có prompt
+        """
+        # Lấy prompt đã tăng cường
+        enhanced_prompt = scene_data.get("enhanced_prompt", "")
+        original_scene = scene_data.get("original_scene", "")
+        
+        if not enhanced_prompt:
+            logger.warning(f"Khong tim thay prompt tang cuong cho canh {scene_index}")
+            return None
+        
+        logger.info(f"Dang tao hinh anh cho canh {scene_index}")
+        
+        # Tạo hình ảnh
+        image_info = self.generate_image_from_prompt(enhanced_prompt, scene_index)
+        
+        # Thêm thông tin cảnh
+        image_info["idea_id"] = base_idea.get("ID")
+        image_info["original_idea"] = base_idea.get("Idea")
+        image_info["original_scene"] = original_scene
+        image_info["environment_prompt"] = base_idea.get("Environment_Prompt")
+        image_info["scene_index"] = scene_index
+        
+        return image_info
+    
     def process_enhanced_scenes(self) -> List[Dict[str, Any]]:
         """
         Xử lý các cảnh đã tăng cường để tạo hình ảnh.
@@ -325,51 +401,59 @@ class ImageGenerator:
         
         logger.info(f"Dang tao hinh anh cho {len(enhanced_scenes)} canh")
         
-        # Xử lý từng cảnh
-        results = []
+        # Gom các cảnh có cùng prompt để chỉ tạo và tải lên ảnh một lần
+        prompt_to_indices: Dict[str, List[int]] = defaultdict(list)
         for i, scene_data in enumerate(enhanced_scenes):
-            logger.info(f"Dang tao hinh anh cho canh {i+1}/{len(enhanced_scenes)}")
-            
-            # Lấy prompt đã tăng cường
             enhanced_prompt = scene_data.get("enhanced_prompt", "")
-            original_scene = scene_data.get("original_scene", "")
-            
             if not enhanced_prompt:
                 logger.warning(f"Khong tim thay prompt tang cuong cho canh {i+1}")
                 continue
+            prompt_to_indices[enhanced_prompt].append(i)
+        
+        groups = list(prompt_to_indices.values())
+        if len(groups) < len(enhanced_scenes):
+            logger.info(f"Co {len(groups)} prompt khac nhau trong {len(enhanced_scenes)} canh")
+        
+        # Tạo ảnh và tải lên Drive trên hai pool riêng: worker tạo ảnh không phải chờ tải lên
+        # (tốc độ gọi Pollinations do token bucket giới hạn)
+        group_results = [None] * len(groups)
+        with ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS) as generate_executor, \
+                ThreadPoolExecutor(max_workers=settings.IMAGE_UPLOAD_WORKERS) as upload_executor:
+            generate_futures = {
+                generate_executor.submit(
+                    self._generate_scene_image, indices[0] + 1, enhanced_scenes[indices[0]], base_idea
+                ): g
+                for g, indices in enumerate(groups)
+            }
+            upload_futures = {}
+            for future in as_completed(generate_futures):
+                g = generate_futures[future]
+                image_info = future.result()
+                if image_info and image_info.get("success", False):
+                    upload_futures[upload_executor.submit(self.upload_to_drive, image_info)] = g
+                else:
+                    group_results[g] = image_info
             
-            # Tạo hình ảnh
-            image_info = self.generate_image_from_prompt(enhanced_prompt, i+1)
-            
-            # Thêm thông tin cảnh
-            image_info["idea_id"] = base_idea.get("ID")
-            image_info["original_idea"] = base_idea.get("Idea")
-            image_info["original_scene"] = original_scene
-            image_info["environment_prompt"] = base_idea.get("Environment_Prompt")
-            image_info["scene_index"] = i+1
-            
-            # Tải lên Google Drive
-            if image_info.get("success", False):
-                image_info = self.upload_to_drive(image_info)
-            
-            results.append(image_info)
-            
-            # Thêm độ trễ giữa các lần gọi API
-            if i < len(enhanced_scenes) - 1:
-                time.sleep(2)
+            for future in as_completed(upload_futures):
+                group_results[upload_futures[future]] = future.result()
+        
+        # Phân phối kết quả cho các cảnh trùng prompt (dùng chung file trên Drive), giữ thứ tự cảnh
+        scene_results = [None] * len(enhanced_scenes)
+        for indices, image_info in zip(groups, group_results):
+            scene_results[indices[0]] = image_info
+            for i in indices[1:]:
+                duplicate = dict(image_info)
+                duplicate["scene_index"] = i + 1
+                duplicate["original_scene"] = enhanced_scenes[i].get("original_scene", "")
+                duplicate["filename"] = settings.image_filename(i + 1)
+                duplicate["duplicate_of"] = indices[0] + 1
+                scene_results[i] = duplicate
+        
+        results = [r for r in scene_results if r is not None]
         
         # Lưu kết quả vào file tạm thời cho các bước tiếp theo
         output_file = os.path.join(settings.TEMP_DIR, "enhanced_image_results.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            # Loại bỏ dữ liệu base64 từ kết quả JSON để tránh file quá lớn
-            light_results = []
-            for result in results:
-                result_copy = result.copy()
-                if "image_base64" in result_copy:
-                    del result_copy["image_base64"]
-                light_results.append(result_copy)
-            
-            json.dump(light_results, f, ensure_ascii=False, indent=2)
+        dump_json(results, output_file)
         
         # Tổng kết
         success_count = sum(1 for r in results if r.get("success", False))
@@ -416,13 +500,7 @@ class ImageGenerator:
         
         # Lưu kết quả
         output_file = os.path.join(settings.TEMP_DIR, "sheets_image_result.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            # Loại bỏ dữ liệu base64
-            result_copy = image_info.copy()
-            if "image_base64" in result_copy:
-                del result_copy["image_base64"]
-            
-            json.dump(result_copy, f, ensure_ascii=False, indent=2)
+        dump_json(image_info, output_file)
         
         return [image_info]
 
@@ -9,10 +9,12 @@ Script điều khiển chính cho hệ thống tạo video POV tự động về
 import os
 import sys
 import time
-import argparse
+import asyncio
+import functools
+import importlib
 import logging
-import json
-from typing import Optional, Dict, Any, List, Callable
+import shutil
+from typing import Optional, Dict, Any, List, Set, Callable
 from datetime import datetime
 
 # Thêm thư mục gốc của dự án vào sys.path
@@ -20,88 +22,112 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 # Import cấu hình
 from config import settings
-
-# Tiếp tục với các import khác...
-
-# Import các module xử lý trong dự án
-from scripts.idea_generator import main as generate_ideas
-from scripts.image_generator import main as generate_images
-from scripts.video_processor import main as process_videos
-from scripts.audio_generator import main as generate_audio
-from scripts.video_composer import main as compose_video
-from scripts.scene_prompt_enhancer import main as scene_prompt_enhancer
-from scripts.youtube_publisher import main as publish_youtube
-from scripts.scene_sequence_generator import main as generate_scenes
+from utils.json_utils import load_json, dump_json
+from utils.retry import backoff_delay
 
 # Thiết lập logging
-logging.basicConfig(
-    level=settings.LOG_LEVEL,
-    format=settings.LOG_FORMAT,
-    handlers=[
-        logging.FileHandler(settings.LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+settings.configure_logging()
 logger = logging.getLogger(__name__)
 
 # Định nghĩa các bước trong quy trình
+# Module của mỗi bước chỉ được import khi bước đó chạy (tránh nạp moviepy, Gemini, Google API... không cần thiết)
+# "enabled" lấy từ cờ RUN_* trong settings: bước bị tắt sẽ được bỏ qua (pass-through)
 STEPS = {
     "ideas": {
         "name": "Tạo ý tưởng POV",
-        "function": generate_ideas,
-        "depends_on": None
+        "module": "scripts.idea_generator",
+        "function_name": "main",
+        "depends_on": None,
+        "enabled": settings.RUN_IDEA_GENERATION
     },
     "scenes": {  # Bước mới
         "name": "Tạo chuỗi cảnh",
-        "function": generate_scenes,
-        "depends_on": "ideas"
+        "module": "scripts.scene_sequence_generator",
+        "function_name": "main",
+        "depends_on": "ideas",
+        "enabled": settings.RUN_SCENE_GENERATION
     },
     "prompts": {
         "name": "Tăng cường prompt",
-        "function": scene_prompt_enhancer,
-        "depends_on": "scenes"  # Đã thay đổi: phụ thuộc vào scenes thay vì ideas
+        "module": "scripts.scene_prompt_enhancer",
+        "function_name": "main",
+        "depends_on": "scenes",  # Đã thay đổi: phụ thuộc vào scenes thay vì ideas
+        "enabled": settings.RUN_PROMPT_ENHANCEMENT
     },
     "images": {
         "name": "Tạo hình ảnh",
-        "function": generate_images,
-        "depends_on": "prompts"
+        "module": "scripts.image_generator",
+        "function_name": "main",
+        "depends_on": "prompts",
+        "enabled": settings.RUN_IMAGE_GENERATION
     },
     "videos": {
         "name": "Xử lý video",
-        "function": process_videos,
-        "depends_on": "images"
+        "module": "scripts.video_processor",
+        "function_name": "main",
+        "depends_on": "images",
+        "enabled": settings.RUN_VIDEO_PROCESSING
     },
     "audio": {
         "name": "Tạo âm thanh",
-        "function": generate_audio,
-        "depends_on": "scenes"  # Đã thay đổi: phụ thuộc vào scenes thay vì ideas
+        "module": "scripts.audio_generator",
+        "function_name": "main",
+        "depends_on": "prompts",  # Đọc enhanced_scene_prompts.json do bước prompts tạo ra
+        "enabled": settings.RUN_AUDIO_GENERATION
     },
     "compose": {
         "name": "Ghép video",
-        "function": compose_video,
-        "depends_on": ["videos", "audio"]
+        "module": "scripts.video_composer",
+        "function_name": "main",
+        "depends_on": ["videos", "audio"],
+        "enabled": settings.RUN_VIDEO_COMPOSITION
     },
     "publish": {
         "name": "Đăng tải YouTube",
-        "function": publish_youtube,
-        "depends_on": "compose"
+        "module": "scripts.youtube_publisher",
+        "function_name": "main",
+        "depends_on": "compose",
+        "enabled": settings.RUN_YOUTUBE_UPLOAD
     }
 }
 
+# Thứ tự các bước, tính một lần để tra cứu vị trí bước theo ID
+_STEP_NAMES = tuple(STEPS)
+_STEP_ORDER = {step_id: index for index, step_id in enumerate(_STEP_NAMES)}
+
+def get_dependencies(step_id: str) -> List[str]:
+    """
+    Lấy danh sách các bước mà một bước phụ thuộc vào.
+    
+    Args:
+        step_id: ID của bước
+        
+    Returns:
+        List[str]: Danh sách ID các bước phụ thuộc
+    """
+    depends = STEPS[step_id]["depends_on"]
+    if not depends:
+        return []
+    if isinstance(depends, str):
+        return [depends]
+    return list(depends)
+
+@functools.cache
 def setup_environment() -> None:
     """
     Thiết lập môi trường làm việc, tạo các thư mục cần thiết.
+    Chỉ chạy một lần mỗi tiến trình; gọi setup_environment.cache_clear() khi các thư mục bị xóa.
     """
     try:
-        # Tạo thư mục temp và các thư mục con
-        os.makedirs(settings.TEMP_DIR, exist_ok=True)
-        os.makedirs(os.path.join(settings.TEMP_DIR, "images"), exist_ok=True)
-        os.makedirs(os.path.join(settings.TEMP_DIR, "videos"), exist_ok=True)
-        os.makedirs(os.path.join(settings.TEMP_DIR, "audio"), exist_ok=True)
-        
-        # Tạo thư mục logs và credentials
-        os.makedirs(settings.LOGS_DIR, exist_ok=True)
-        os.makedirs(settings.CREDENTIALS_DIR, exist_ok=True)
+        # Tạo thư mục temp và các thư mục con, thư mục logs và credentials
+        for directory in (
+            os.path.join(settings.TEMP_DIR, "images"),
+            os.path.join(settings.TEMP_DIR, "videos"),
+            os.path.join(settings.TEMP_DIR, "audio"),
+            settings.LOGS_DIR,
+            settings.CREDENTIALS_DIR,
+        ):
+            os.makedirs(directory, exist_ok=True)
         
         logger.info("Đã thiết lập môi trường làm việc thành công")
     except Exception as e:
@@ -110,7 +136,7 @@ def setup_environment() -> None:
 
 def clean_temp_directory() -> bool:
     """
-    Xóa tất cả các file trong thư mục temp để bắt đầu quy trình mới.
+    Xóa toàn bộ nội dung thư mục temp (trừ các cache giữa các lần chạy) để bắt đầu quy trình mới.
     
     Returns:
         bool: True nếu thành công, False nếu có lỗi
@@ -120,41 +146,88 @@ def clean_temp_directory() -> bool:
             logger.warning(f"Thư mục temp không tồn tại: {settings.TEMP_DIR}")
             return True
         
-        # Đếm tổng số file
-        total_files = 0
-        for root, dirs, files in os.walk(settings.TEMP_DIR):
-            total_files += len(files)
+        # Xóa nguyên cây thư mục con bằng shutil.rmtree thay vì xóa từng file
+        total_entries = 0
+        failed_entries = 0
+        with os.scandir(settings.TEMP_DIR) as entries:
+            for entry in entries:
+                if entry.name in settings.TEMP_CACHE_ENTRIES:
+                    continue
+                total_entries += 1
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.remove(entry.path)
+                    logger.debug(f"Đã xóa: {entry.path}")
+                except Exception as entry_error:
+                    failed_entries += 1
+                    logger.error(f"Không thể xóa {entry.path}: {str(entry_error)}")
+        
+        # Tạo lại các thư mục con chuẩn
+        setup_environment.cache_clear()
+        setup_environment()
         
-        if total_files == 0:
+        if total_entries == 0:
             logger.info(f"Không có file nào trong thư mục temp")
             return True
         
-        # Xóa từng file
-        deleted_count = 0
-        for root, dirs, files in os.walk(settings.TEMP_DIR):
-            for file in files:
-                file_path = os.path.join(root, file)
-                try:
-                    os.remove(file_path)
-                    deleted_count += 1
-                    logger.debug(f"Đã xóa file: {file_path}")
-                except Exception as file_error:
-                    logger.error(f"Không thể xóa file {file_path}: {str(file_error)}")
-        
-        logger.info(f"Đã xóa {deleted_count}/{total_files} file trong thư mục temp")
-        return deleted_count == total_files
+        logger.info(f"Đã xóa {total_entries - failed_entries}/{total_entries} mục trong thư mục temp")
+        return failed_entries == 0
         
     except Exception as e:
         logger.error(f"Lỗi khi xóa files trong thư mục temp: {str(e)}")
         return False
 
-def run_step(step_id: str, retry_count: int = 1) -> Optional[Any]:
+def is_result_fresh(step_id: str) -> bool:
+    """
+    Kiểm tra kết quả đã lưu của một bước có còn mới không (giống make): file kết quả
+    phải tồn tại và mới hơn kết quả của tất cả các bước phụ thuộc.
+    
+    Args:
+        step_id: ID của bước
+        
+    Returns:
+        bool: True nếu kết quả đã lưu còn mới
+    """
+    result_file = os.path.join(settings.TEMP_DIR, f"{step_id}_result.json")
+    try:
+        result_mtime = os.path.getmtime(result_file)
+        for dep in get_dependencies(step_id):
+            dep_result_file = os.path.join(settings.TEMP_DIR, f"{dep}_result.json")
+            if os.path.exists(dep_result_file) and os.path.getmtime(dep_result_file) > result_mtime:
+                return False
+        return True
+    except OSError:
+        return False
+
+def load_fresh_result(step_id: str) -> Optional[Any]:
+    """
+    Đọc kết quả đã lưu của một bước nếu vẫn còn mới (xem is_result_fresh).
+    
+    Args:
+        step_id: ID của bước
+        
+    Returns:
+        Kết quả đã lưu hoặc None nếu chưa có hoặc đã cũ
+    """
+    if not is_result_fresh(step_id):
+        return None
+    try:
+        return load_json(os.path.join(settings.TEMP_DIR, f"{step_id}_result.json"))
+    except (OSError, ValueError):
+        return None
+
+def run_step(step_id: str, retry_count: int = 1, resume: bool = False,
+             present: Optional[Set[str]] = None) -> Optional[Any]:
     """
     Chạy một bước trong quy trình tạo video.
     
     Args:
         step_id: ID của bước cần chạy
         retry_count: Số lần thử lại nếu bước thất bại
+        resume: Dùng lại kết quả đã lưu nếu vẫn còn mới thay vì chạy lại bước
+        present: Tập file kết quả đã biết là tồn tại, dùng chung trong một lần chạy quy trình
         
     Returns:
         Kết quả của bước hoặc None nếu thất bại
@@ -164,30 +237,36 @@ def run_step(step_id: str, retry_count: int = 1) -> Optional[Any]:
         logger.error(f"Không tìm thấy bước với ID: {step_id}")
         return None
     
+    if present is None:
+        present = set()
+    result_file = os.path.join(settings.TEMP_DIR, f"{step_id}_result.json")
+    
+    if resume:
+        result = load_fresh_result(step_id)
+        if result:
+            present.add(result_file)
+            logger.info(f"=== Bỏ qua bước: {step['name']} ({step_id}) - Dùng lại kết quả đã lưu ===")
+            return result
+    
     logger.info(f"=== Bắt đầu bước: {step['name']} ({step_id}) ===")
     
     # Kiểm tra các điều kiện tiên quyết
-    if step["depends_on"]:
-        depends = step["depends_on"]
-        if isinstance(depends, str):
-            depends = [depends]
-        
-        for dep in depends:
-            dep_result_file = os.path.join(settings.TEMP_DIR, f"{dep}_result.json")
-            if not os.path.exists(dep_result_file):
-                logger.warning(f"Không tìm thấy kết quả của bước {dep}, bước {step_id} có thể sẽ không hoạt động đúng")
+    for dep in get_dependencies(step_id):
+        dep_result_file = os.path.join(settings.TEMP_DIR, f"{dep}_result.json")
+        if dep_result_file not in present and not os.path.exists(dep_result_file):
+            logger.warning(f"Không tìm thấy kết quả của bước {dep}, bước {step_id} có thể sẽ không hoạt động đúng")
     
     # Thực hiện bước với retry
     for attempt in range(retry_count):
         try:
             logger.info(f"Đang thực hiện bước {step_id} (lần thử {attempt + 1}/{retry_count})")
-            result = step["function"]()
+            step_function = getattr(importlib.import_module(step["module"]), step["function_name"])
+            result = step_function()
             
             # Lưu kết quả vào file nếu result là dict hoặc list
             if result and (isinstance(result, dict) or isinstance(result, list)):
-                result_file = os.path.join(settings.TEMP_DIR, f"{step_id}_result.json")
-                with open(result_file, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, ensure_ascii=False, indent=2)
+                dump_json(result, result_file)
+                present.add(result_file)
                 logger.info(f"Đã lưu kết quả của bước {step_id} vào file {result_file}")
             
             logger.info(f"=== Kết thúc bước: {step['name']} ({step_id}) - Thành công ===")
@@ -196,14 +275,58 @@ def run_step(step_id: str, retry_count: int = 1) -> Optional[Any]:
         except Exception as e:
             logger.error(f"Lỗi khi thực hiện bước {step_id} (lần thử {attempt + 1}/{retry_count}): {str(e)}")
             if attempt < retry_count - 1:
-                wait_time = settings.RETRY_DELAY * (attempt + 1)
-                logger.info(f"Thử lại sau {wait_time} giây...")
+                wait_time = backoff_delay(attempt, settings.RETRY_DELAY, settings.STEP_RETRY_MAX_DELAY)
+                logger.info(f"Thử lại sau {wait_time:.1f} giây...")
                 time.sleep(wait_time)
             else:
                 logger.error(f"=== Kết thúc bước: {step['name']} ({step_id}) - Thất bại sau {retry_count} lần thử ===")
                 return None
 
-def run_pipeline(start_step: Optional[str] = None, end_step: Optional[str] = None, retry_count: int = 2, clean_temp: bool = True) -> Dict[str, Any]:
+async def run_steps_concurrently(steps_to_run: List[str], retry_count: int,
+                                 resume: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Chạy các bước theo đồ thị phụ thuộc: mỗi bước chạy trong một thread riêng
+    ngay khi các bước phụ thuộc của nó hoàn thành, nên các nhánh độc lập
+    (ví dụ images → videos và audio) được thực hiện song song.
+    
+    Args:
+        steps_to_run: Danh sách ID các bước cần chạy
+        retry_count: Số lần thử lại mỗi bước nếu thất bại
+        resume: Dùng lại kết quả đã lưu của các bước còn mới
+        
+    Returns:
+        Dict: Kết quả của từng bước theo ID
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+    present: Set[str] = set()  # File kết quả đã ghi trong lần chạy này, tránh stat lại
+    
+    async def run_when_ready(step_id: str) -> bool:
+        # Chờ các bước phụ thuộc nằm trong phạm vi chạy
+        for dep in get_dependencies(step_id):
+            if dep in tasks and not await tasks[dep] and settings.STOP_ON_ERROR:
+                logger.error(f"Bỏ qua bước {step_id} do bước {dep} thất bại")
+                results[step_id] = {"success": False, "skipped": True}
+                return False
+        
+        if not STEPS[step_id]["enabled"]:
+            logger.info(f"Bước {step_id} đã bị tắt trong settings, bỏ qua")
+            results[step_id] = {"success": True, "skipped": True}
+            return True
+        
+        result = await asyncio.to_thread(run_step, step_id, retry_count, resume, present)
+        results[step_id] = {"success": result is not None}
+        return result is not None
+    
+    for step_id in steps_to_run:
+        tasks[step_id] = asyncio.create_task(run_when_ready(step_id))
+    await asyncio.gather(*tasks.values())
+    
+    # Giữ thứ tự các bước như trong STEPS
+    return {step_id: results[step_id] for step_id in steps_to_run}
+
+def run_pipeline(start_step: Optional[str] = None, end_step: Optional[str] = None, retry_count: int = 2, clean_temp: bool = True,
+                 steps: Optional[List[str]] = None, resume: bool = False) -> Dict[str, Any]:
     """
     Chạy toàn bộ hoặc một phần của quy trình tạo video.
     
@@ -211,7 +334,9 @@ def run_pipeline(start_step: Optional[str] = None, end_step: Optional[str] = Non
         start_step: Bước bắt đầu (chạy từ đầu nếu None)
         end_step: Bước kết thúc (chạy đến cuối nếu None)
         retry_count: Số lần thử lại mỗi bước nếu thất bại
-        clean_temp: Xóa thư mục temp trước khi bắt đầu
+        clean_temp: Xóa thư mục temp trước khi bắt đầu (bỏ qua khi resume)
+        steps: Danh sách bước cụ thể cần chạy (bỏ qua start_step/end_step nếu có)
+        resume: Dùng lại kết quả đã lưu của các bước còn mới thay vì chạy lại
         
     Returns:
         Dict: Kết quả của toàn bộ quy trình
@@ -219,39 +344,46 @@ def run_pipeline(start_step: Optional[str] = None, end_step: Optional[str] = Non
     # Thiết lập môi trường
     setup_environment()
     
-    # Xóa thư mục temp nếu cần
-    if clean_temp and start_step == "ideas":
+    # Xóa thư mục temp nếu cần (không xóa khi resume, vì resume dùng lại các file kết quả trong temp)
+    if clean_temp and not resume and start_step == "ideas":
         logger.info("Xóa thư mục temp trước khi bắt đầu quy trình mới")
         clean_temp_directory()
     
     # Xác định các bước cần chạy
-    steps_to_run = list(STEPS.keys())
+    steps_to_run = list(_STEP_NAMES)
+    
+    if steps:
+        steps_to_run = [step_id for step_id in steps_to_run if step_id in steps]
     
     if start_step and start_step in steps_to_run:
-        start_index = steps_to_run.index(start_step)
-        steps_to_run = steps_to_run[start_index:]
+        start_index = _STEP_ORDER[start_step]
+        steps_to_run = [step_id for step_id in steps_to_run if _STEP_ORDER[step_id] >= start_index]
     
     if end_step and end_step in steps_to_run:
-        end_index = steps_to_run.index(end_step)
-        steps_to_run = steps_to_run[:end_index + 1]
+        end_index = _STEP_ORDER[end_step]
+        steps_to_run = [step_id for step_id in steps_to_run if _STEP_ORDER[step_id] <= end_index]
+    
+    # Khi resume và mọi bước đã có kết quả còn mới thì không cần chạy gì (không ghi lại bản tóm tắt)
+    if resume and all(is_result_fresh(step_id) for step_id in steps_to_run if STEPS[step_id]["enabled"]):
+        logger.info(f"Tất cả {len(steps_to_run)} bước đã có kết quả còn mới, không có gì để chạy")
+        return {
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "duration": 0.0,
+            "steps_total": len(steps_to_run),
+            "steps_success": len(steps_to_run),
+            "results": {
+                step_id: {"success": True, "cached": True} if STEPS[step_id]["enabled"] else {"success": True, "skipped": True}
+                for step_id in steps_to_run
+            }
+        }
     
     # Ghi log bắt đầu
     logger.info(f"=== Bắt đầu quy trình tạo video POV (từ {steps_to_run[0]} đến {steps_to_run[-1]}) ===")
     start_time = time.time()
     
-    # Chạy từng bước
-    results = {}
-    success_count = 0
-    
-    for step_id in steps_to_run:
-        result = run_step(step_id, retry_count)
-        results[step_id] = {"success": result is not None}
-        
-        if result is not None:
-            success_count += 1
-        elif settings.STOP_ON_ERROR:
-            logger.error(f"Dừng quy trình do bước {step_id} thất bại")
-            break
+    # Chạy các bước, mỗi bước bắt đầu ngay khi các bước phụ thuộc hoàn thành
+    results = asyncio.run(run_steps_concurrently(steps_to_run, retry_count, resume))
+    success_count = sum(1 for r in results.values() if r["success"])
     
     # Ghi log kết thúc
     end_time = time.time()
@@ -272,18 +404,23 @@ def run_pipeline(start_step: Optional[str] = None, end_step: Optional[str] = Non
     
     # Lưu tóm tắt vào file
     summary_file = os.path.join(settings.TEMP_DIR, "pipeline_summary.json")
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        json.dump(summary, f, ensure_ascii=False, indent=2)
+    dump_json(summary, summary_file)
     
     return summary
 
-def parse_arguments():
+def parse_arguments(argv: Optional[List[str]] = None):
     """
     Phân tích tham số dòng lệnh.
     
+    Args:
+        argv: Danh sách tham số (mặc định: sys.argv[1:])
+        
     Returns:
         argparse.Namespace: Tham số đã phân tích
     """
+    # Chỉ import argparse khi chạy từ dòng lệnh; gọi run_pipeline trực tiếp không cần đến
+    import argparse
+    
     parser = argparse.ArgumentParser(description='Hệ thống tạo video POV tự động về Ai Cập cổ đại')
     
     parser.add_argument('--step', type=str, choices=STEPS.keys(),
@@ -295,6 +432,9 @@ def parse_arguments():
     parser.add_argument('--end', type=str, choices=STEPS.keys(),
                         help='Kết thúc quy trình ở bước này')
     
+    parser.add_argument('--steps', type=str,
+                        help='Chạy các bước cụ thể, phân tách bằng dấu phẩy (ví dụ: ideas,scenes,prompts)')
+    
     parser.add_argument('--retry', type=int, default=2,
                         help='Số lần thử lại cho mỗi bước (mặc định: 2)')
     
@@ -304,25 +444,46 @@ def parse_arguments():
     parser.add_argument('--keep-temp', action='store_true',
                         help='Không xóa thư mục temp trước khi bắt đầu')
     
-    return parser.parse_args()
+    parser.add_argument('--resume', action='store_true',
+                        help='Bỏ qua các bước đã có kết quả mới hơn kết quả của các bước phụ thuộc (ngầm định --keep-temp)')
+    
+    args = parser.parse_args(argv)
+    
+    if args.steps:
+        args.steps = [step.strip() for step in args.steps.split(',') if step.strip()]
+        invalid_steps = [step for step in args.steps if step not in STEPS]
+        if invalid_steps:
+            parser.error(f"Bước không hợp lệ: {', '.join(invalid_steps)}")
+    
+    return args
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """
     Hàm chính điều khiển toàn bộ quy trình.
+    
+    Args:
+        argv: Danh sách tham số dòng lệnh (mặc định: sys.argv[1:])
     """
-    args = parse_arguments()
+    args = parse_arguments(argv)
     
     try:
         if args.step:
             # Chạy một bước cụ thể
             logger.info(f"Chạy bước đơn lẻ: {args.step}")
-            result = run_step(args.step, args.retry)
+            result = run_step(args.step, args.retry, args.resume)
             return result is not None
             
+        elif args.steps:
+            # Chạy nhiều bước trong cùng một tiến trình
+            logger.info(f"Chạy các bước: {', '.join(args.steps)}")
+            summary = run_pipeline(retry_count=args.retry, clean_temp=not args.keep_temp, steps=args.steps,
+                                   resume=args.resume)
+            return summary["steps_success"] == summary["steps_total"]
+            
         elif args.all or (args.start or args.end):
             # Chạy quy trình từ start đến end
             logger.info(f"Chạy quy trình từ '{args.start or 'đầu'}' đến '{args.end or 'cuối'}'")
-            summary = run_pipeline(args.start, args.end, args.retry, not args.keep_temp)
+            summary = run_pipeline(args.start, args.end, args.retry, not args.keep_temp, resume=args.resume)
             return summary["steps_success"] == summary["steps_total"]
             
         else:
@@ -334,7 +495,9 @@ def main():
             print("  python main.py --step ideas              # Chạy bước tạo ý tưởng")
             print("  python main.py --step publish            # Chỉ đăng tải lên YouTube")
             print("  python main.py --start images --end compose  # Chạy từ tạo hình ảnh đến ghép video")
+            print("  python main.py --steps images,audio      # Chạy nhiều bước cụ thể")
             print("  python main.py --all --keep-temp         # Chạy quy trình không xóa thư mục temp")
+            print("  python main.py --all --resume            # Bỏ qua các bước đã có kết quả còn mới")
             print("================================================")
             return True
             
@@ -343,5 +506,5 @@ def main():
         return False
 
 if __name__ == "__main__":
-    success = main()
+    success = main(sys.argv[1:])
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -9,7 +9,10 @@ Lấy chuỗi cảnh đã tạo và bổ sung chi tiết để tạo prompt hìn
 import os
 import sys
 import json
+import hashlib
+import re
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 
 # Thêm thư mục gốc vào đường dẫn
@@ -21,18 +24,46 @@ import google.generativeai as genai
 # Import module nội bộ
 from config import settings, prompt_templates
 from utils.google_sheets import GoogleSheetsManager
+from utils.media_cache import MediaCache
+from utils.json_utils import load_json, dump_json
 
 # Thiết lập logging
 logger = logging.getLogger(__name__)
-log_handler = logging.FileHandler(settings.LOG_FILE, encoding='utf-8')
-console_handler = logging.StreamHandler(sys.stdout)
-log_formatter = logging.Formatter(settings.LOG_FORMAT)
-log_handler.setFormatter(log_formatter)
-console_handler.setFormatter(log_formatter)
+settings.configure_logging()
 
-logger.setLevel(settings.LOG_LEVEL)
-logger.addHandler(log_handler)
-logger.addHandler(console_handler)
+# Các từ hành động dùng cho tăng cường đơn giản, biên dịch một lần thành regex
+ACTION_WORDS = ("gripping", "running", "reaching", "holding", "walking", "stumbling",
+                "climbing", "lifting", "turning", "stepping", "pushing", "pulling")
+_ACTION_RE = re.compile(r"\b(" + "|".join(ACTION_WORDS) + r")\b", re.IGNORECASE)
+
+# Phần chi tiết bổ sung cố định ở cuối prompt tăng cường đơn giản
+SIMPLE_PROMPT_SUFFIX = (". Hyper-realistic, cinematic quality, 8k resolution, golden hour lighting, "
+                        "detailed textures, immersive perspective.")
+
+# Độ dài tối đa của prompt tăng cường (ký tự)
+MAX_PROMPT_LENGTH = 450
+
+def _truncate_prompt(prompt: str, width: int = MAX_PROMPT_LENGTH) -> str:
+    """
+    Cắt ngắn prompt tại ranh giới từ gần nhất, không cắt giữa một từ.
+    Giữ nguyên khoảng trắng và xuống dòng (cấu trúc Foreground:/Background:).
+    
+    Args:
+        prompt: Prompt cần cắt ngắn
+        width: Độ dài tối đa (ký tự)
+        
+    Returns:
+        str: Prompt không dài quá width ký tự
+    """
+    if len(prompt) <= width:
+        return prompt
+    truncated = prompt[:width]
+    # Vị trí cắt rơi vào giữa một từ: bỏ phần từ bị cắt dở (trừ khi cả đoạn chỉ là một từ)
+    if not prompt[width].isspace():
+        head = truncated.rsplit(None, 1)
+        if len(head) > 1:
+            truncated = head[0]
+    return truncated.rstrip()
 
 class ScenePromptEnhancer:
     """
@@ -47,12 +78,27 @@ class ScenePromptEnhancer:
         if settings.GEMINI_API_KEY:
             genai.configure(api_key=settings.GEMINI_API_KEY)
             self.gemini_available = True
+            
+            # Tạo model một lần, dùng lại cho mọi lần gọi
+            self.model = genai.GenerativeModel('gemini-1.5-flash')
         else:
             logger.warning("Không tìm thấy GEMINI_API_KEY. Khả năng tăng cường chi tiết có thể bị hạn chế.")
             self.gemini_available = False
             
-        # Tải template prompt tạo chi tiết cảnh
-        self.detail_template = prompt_templates.SCENE_DETAIL_PROMPT
+        # Tải template prompt tạo chi tiết cảnh (phần mở đầu dùng chung + phần đầu vào từng cảnh)
+        self.detail_parts = prompt_templates.scene_detail_parts
+        self.batch_detail_parts = prompt_templates.batch_scene_detail_parts
+        
+        # Cache prompt đã tăng cường theo (cảnh, môi trường, model, template); sửa template
+        # sẽ làm thay đổi khóa nên các mục cũ tự động bị bỏ qua
+        self.prompt_cache = MediaCache(
+            os.path.join(settings.TEMP_DIR, "prompt_cache.json"),
+            required_key="enhanced_prompt"
+        )
+        template_digest = hashlib.sha256(
+            (prompt_templates.SCENE_DETAIL_PROMPT + prompt_templates.BATCH_SCENE_DETAIL_INPUT_PROMPT).encode("utf-8")
+        ).hexdigest()[:16]
+        self.prompt_variant = f"gemini-1.5-flash|{template_digest}"
         
         logger.info("Khởi tạo ScenePromptEnhancer thành công")
     
@@ -69,8 +115,7 @@ class ScenePromptEnhancer:
             
             # Kiểm tra file tồn tại
             if os.path.exists(input_file):
-                with open(input_file, 'r', encoding='utf-8') as f:
-                    idea_with_scenes = json.load(f)
+                idea_with_scenes = load_json(input_file)
                     
                 logger.info(f"Đã đọc ý tưởng với {idea_with_scenes.get('scene_count', 0)} cảnh từ file")
                 return idea_with_scenes
@@ -97,14 +142,12 @@ class ScenePromptEnhancer:
             return self._simple_enhance(scene, environment_desc)
             
         try:
-            # Chuẩn bị prompt template
-            prompt = self.detail_template.replace("{scene_input}", scene)
-            prompt = prompt.replace("{environment_desc}", environment_desc)
+            # Chuẩn bị nội dung request: phần mở đầu cố định và phần đầu vào là hai part riêng
+            contents = self.detail_parts(scene, environment_desc)
             
             # Gọi Gemini API
             logger.info(f"Đang tăng cường chi tiết cho cảnh: '{scene[:50]}...'")
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(prompt)
+            response = self.model.generate_content(contents)
             
             if not response.text:
                 logger.error("Không nhận được phản hồi từ Gemini API")
@@ -114,10 +157,11 @@ class ScenePromptEnhancer:
             enhanced_prompt = response.text.strip()
             
             # Kiểm tra độ dài và cắt ngắn nếu cần
-            if len(enhanced_prompt) > 450:
-                logger.warning(f"Prompt quá dài ({len(enhanced_prompt)} ký tự), đang cắt ngắn còn 450 ký tự")
-                enhanced_prompt = enhanced_prompt[:450]
+            if len(enhanced_prompt) > MAX_PROMPT_LENGTH:
+                logger.warning(f"Prompt quá dài ({len(enhanced_prompt)} ký tự), đang cắt ngắn còn {MAX_PROMPT_LENGTH} ký tự")
+                enhanced_prompt = _truncate_prompt(enhanced_prompt)
             
+            self._put_cached_prompt(scene, environment_desc, enhanced_prompt)
             logger.info(f"Đã tăng cường chi tiết thành công: '{enhanced_prompt[:50]}...'")
             return enhanced_prompt
             
@@ -125,6 +169,113 @@ class ScenePromptEnhancer:
             logger.error(f"Lỗi khi tăng cường chi tiết cảnh: {str(e)}")
             return self._simple_enhance(scene, environment_desc)
     
+    def enhance_scenes_batch(self, scenes: List[str], environment_desc: str) -> Optional[List[str]]:
+        """
+        Tăng cường chi tiết cho tất cả các cảnh trong một lần gọi Gemini API.
+        
+        Args:
+            scenes: Danh sách mô tả cảnh gốc
+            environment_desc: Mô tả môi trường
+            
+        Returns:
+            List[str]: Danh sách prompt chi tiết theo đúng thứ tự cảnh, hoặc None nếu thất bại
+        """
+        if not self.gemini_available or not scenes:
+            return None
+            
+        try:
+            # Chuẩn bị nội dung request với tất cả các cảnh dưới dạng mảng JSON
+            contents = self.batch_detail_parts(json.dumps(scenes, ensure_ascii=False), environment_desc)
+            
+            # Gọi Gemini API một lần cho cả chuỗi cảnh
+            logger.info(f"Đang tăng cường chi tiết cho {len(scenes)} cảnh trong một request")
+            response = self.model.generate_content(
+                contents,
+                generation_config={"response_mime_type": "application/json"}  # Yêu cầu trả về JSON thuần
+            )
+            
+            if not response.text:
+                logger.error("Không nhận được phản hồi từ Gemini API")
+                return None
+                
+            enhanced_prompts = self._parse_batch_response(response.text)
+            
+            if len(enhanced_prompts) != len(scenes):
+                logger.warning(f"Phản hồi batch có {len(enhanced_prompts)} prompt, cần {len(scenes)}")
+                return None
+            
+            # Kiểm tra độ dài và cắt ngắn nếu cần
+            for i, enhanced_prompt in enumerate(enhanced_prompts):
+                if len(enhanced_prompt) > MAX_PROMPT_LENGTH:
+                    logger.warning(f"Prompt cảnh {i+1} quá dài ({len(enhanced_prompt)} ký tự), đang cắt ngắn còn {MAX_PROMPT_LENGTH} ký tự")
+                    enhanced_prompts[i] = _truncate_prompt(enhanced_prompt)
+            
+            for scene, enhanced_prompt in zip(scenes, enhanced_prompts):
+                self._put_cached_prompt(scene, environment_desc, enhanced_prompt)
+            
+            logger.info(f"Đã tăng cường chi tiết thành công {len(enhanced_prompts)} cảnh trong một request")
+            return enhanced_prompts
+            
+        except Exception as e:
+            logger.error(f"Lỗi khi tăng cường chi tiết theo batch: {str(e)}")
+            return None
+    
+    def _get_cached_prompt(self, scene: str, environment_desc: str) -> Optional[str]:
+        """
+        Lấy prompt đã tăng cường bằng Gemini ở lần chạy trước.
+        
+        Args:
+            scene: Mô tả cảnh gốc
+            environment_desc: Mô tả môi trường
+            
+        Returns:
+            str: Prompt đã cache, hoặc None nếu chưa có
+        """
+        entry = self.prompt_cache.get(scene, f"{self.prompt_variant}|{environment_desc}")
+        return entry["enhanced_prompt"] if entry else None
+    
+    def _put_cached_prompt(self, scene: str, environment_desc: str, enhanced_prompt: str) -> None:
+        """
+        Lưu prompt do Gemini tăng cường (không lưu kết quả của _simple_enhance).
+        
+        Args:
+            scene: Mô tả cảnh gốc
+            environment_desc: Mô tả môi trường
+            enhanced_prompt: Prompt đã tăng cường
+        """
+        self.prompt_cache.put(scene, f"{self.prompt_variant}|{environment_desc}", {"enhanced_prompt": enhanced_prompt})
+    
+    def _parse_batch_response(self, response_text: str) -> List[str]:
+        """
+        Phân tích mảng JSON các prompt từ phản hồi batch của Gemini.
+        
+        Args:
+            response_text: Phản hồi văn bản từ Gemini API
+            
+        Returns:
+            List[str]: Danh sách prompt, rỗng nếu phản hồi không hợp lệ
+        """
+        text = response_text.strip()
+        
+        # Bỏ khối markdown ```json ... ``` nếu có
+        start = text.find("[")
+        end = text.rfind("]")
+        if start == -1 or end <= start:
+            logger.warning("Phản hồi batch không chứa mảng JSON")
+            return []
+            
+        try:
+            prompts = json.loads(text[start:end + 1])
+        except ValueError as e:
+            logger.warning(f"Không thể phân tích phản hồi batch: {str(e)}")
+            return []
+            
+        if not isinstance(prompts, list) or not all(isinstance(p, str) and p.strip() for p in prompts):
+            logger.warning("Phản hồi batch không phải danh sách prompt hợp lệ")
+            return []
+            
+        return [p.strip() for p in prompts]
+    
     def _simple_enhance(self, scene: str, environment_desc: str) -> str:
         """
         Tăng cường đơn giản không sử dụng API.
@@ -142,32 +293,16 @@ class ScenePromptEnhancer:
         else:
             scene_content = scene
             
-        # Trích xuất hành động chính
-        action_words = ["gripping", "running", "reaching", "holding", "walking", "stumbling", 
-                      "climbing", "lifting", "turning", "stepping", "pushing", "pulling"]
-                      
-        # Tìm từ hành động trong cảnh
-        found_action = None
-        for action in action_words:
-            if action in scene_content.lower():
-                found_action = action
-                break
-                
-        if not found_action:
-            found_action = "reaching"  # Hành động mặc định
+        # Tìm từ hành động chính trong cảnh (mặc định: reaching)
+        match = _ACTION_RE.search(scene_content)
+        found_action = match.group(1).lower() if match else "reaching"
             
-        # Tạo phần foreground
-        foreground = f"First person view POV GoPro shot of hands {found_action} "
-        
-        # Tạo phần background
-        background = f"In the background, {environment_desc}"
+        # Ghép foreground, background và chi tiết bổ sung trong một lần định dạng
+        enhanced_prompt = (f"First person view POV GoPro shot of hands {found_action} {scene_content}. "
+                           f"In the background, {environment_desc}{SIMPLE_PROMPT_SUFFIX}")
         
-        # Kết hợp lại với chi tiết bổ sung
-        enhanced_prompt = f"{foreground}{scene_content}. {background}. Hyper-realistic, cinematic quality, 8k resolution, golden hour lighting, detailed textures, immersive perspective."
-        
-        # Đảm bảo giới hạn 450 ký tự
-        if len(enhanced_prompt) > 450:
-            enhanced_prompt = enhanced_prompt[:450]
+        # Đảm bảo giới hạn MAX_PROMPT_LENGTH ký tự
+        enhanced_prompt = _truncate_prompt(enhanced_prompt)
             
         logger.info(f"Đã tạo prompt đơn giản: '{enhanced_prompt[:50]}...'")
         return enhanced_prompt
@@ -191,23 +326,40 @@ class ScenePromptEnhancer:
         
         logger.info(f"Đang xử lý {len(scenes)} cảnh để tăng cường chi tiết")
         
-        # Tạo chi tiết cho từng cảnh
-        enhanced_scenes = []
-        for i, scene in enumerate(scenes):
-            logger.info(f"Đang xử lý cảnh {i+1}/{len(scenes)}")
-            enhanced_prompt = self.enhance_scene_prompt(scene, environment_desc)
-            enhanced_scenes.append({
-                "original_scene": scene,
-                "enhanced_prompt": enhanced_prompt
-            })
+        # Dùng lại prompt đã tăng cường ở các lần chạy trước, chỉ gửi các cảnh còn thiếu
+        enhanced_prompts = [self._get_cached_prompt(scene, environment_desc) for scene in scenes]
+        missing = [i for i, enhanced_prompt in enumerate(enhanced_prompts) if enhanced_prompt is None]
+        if len(missing) < len(scenes):
+            logger.info(f"Dùng lại {len(scenes) - len(missing)} prompt đã cache")
+        
+        if missing:
+            missing_scenes = [scenes[i] for i in missing]
+            
+            # Tạo chi tiết cho tất cả các cảnh còn thiếu trong một request
+            new_prompts = self.enhance_scenes_batch(missing_scenes, environment_desc)
+            
+            # Nếu batch thất bại, tạo chi tiết cho từng cảnh (song song, giữ nguyên thứ tự)
+            if new_prompts is None:
+                logger.info(f"Đang xử lý riêng từng cảnh ({len(missing_scenes)} cảnh)")
+                with ThreadPoolExecutor(max_workers=settings.ENHANCE_WORKERS) as executor:
+                    new_prompts = list(executor.map(
+                        lambda scene: self.enhance_scene_prompt(scene, environment_desc), missing_scenes
+                    ))
+            
+            for i, enhanced_prompt in zip(missing, new_prompts):
+                enhanced_prompts[i] = enhanced_prompt
+        
+        enhanced_scenes = [
+            {"original_scene": scene, "enhanced_prompt": enhanced_prompt}
+            for scene, enhanced_prompt in zip(scenes, enhanced_prompts)
+        ]
             
         # Cập nhật ý tưởng với các cảnh đã tăng cường
         idea_with_scenes["enhanced_scenes"] = enhanced_scenes
         
         # Lưu kết quả vào file tạm thời cho các bước tiếp theo
         output_file = os.path.join(settings.TEMP_DIR, "enhanced_scene_prompts.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(idea_with_scenes, f, ensure_ascii=False, indent=2)
+        dump_json(idea_with_scenes, output_file)
             
         logger.info(f"Đã lưu cảnh đã tăng cường vào file: {output_file}")
         
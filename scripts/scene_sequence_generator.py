@@ -8,7 +8,6 @@ Lấy ý tưởng từ Google Sheets và tạo chuỗi prompt chi tiết theo tr
 
 import os
 import sys
-import json
 import logging
 from typing import List, Dict, Any, Optional
 
@@ -21,18 +20,11 @@ import google.generativeai as genai
 # Import module nội bộ
 from config import settings, prompt_templates
 from utils.google_sheets import GoogleSheetsManager
+from utils.json_utils import dump_json
 
 # Thiết lập logging
 logger = logging.getLogger(__name__)
-log_handler = logging.FileHandler(settings.LOG_FILE, encoding='utf-8')
-console_handler = logging.StreamHandler(sys.stdout)
-log_formatter = logging.Formatter(settings.LOG_FORMAT)
-log_handler.setFormatter(log_formatter)
-console_handler.setFormatter(log_formatter)
-
-logger.setLevel(settings.LOG_LEVEL)
-logger.addHandler(log_handler)
-logger.addHandler(console_handler)
+settings.configure_logging()
 
 class SceneSequenceGenerator:
     """
@@ -50,12 +42,15 @@ class SceneSequenceGenerator:
         if settings.GEMINI_API_KEY:
             genai.configure(api_key=settings.GEMINI_API_KEY)
             self.gemini_available = True
+            
+            # Tạo model một lần, dùng lại cho mọi lần gọi
+            self.model = genai.GenerativeModel('gemini-2.0-flash-thinking-exp-01-21')
         else:
             logger.warning("Không tìm thấy GEMINI_API_KEY. Khả năng tạo cảnh có thể bị hạn chế.")
             self.gemini_available = False
             
-        # Tải template prompt tạo chuỗi cảnh
-        self.scene_template = prompt_templates.SCENE_SEQUENCE_PROMPT
+        # Tải template prompt tạo chuỗi cảnh (phần mở đầu dùng chung + phần đầu vào yêu cầu đúng 5 cảnh)
+        self.scene_parts = prompt_templates.scene_sequence_parts
         
         logger.info("Khởi tạo SceneSequenceGenerator thành công")
         
@@ -103,14 +98,12 @@ class SceneSequenceGenerator:
                 logger.warning(f"Tìm thấy ý tưởng POV trống cho ID {idea.get('ID')}")
                 return idea
                 
-            # Sửa prompt để yêu cầu đúng 5 cảnh
-            prompt = self.scene_template.replace("{pov_idea}", pov_idea)
-            prompt = prompt.replace("5-7 distinct scenes", "exactly 5 distinct scenes")
+            # Chuẩn bị nội dung request: phần mở đầu cố định và phần đầu vào là hai part riêng
+            contents = self.scene_parts(pov_idea)
             
             # Gọi Gemini API
             logger.info(f"Đang tạo chuỗi cảnh cho: '{pov_idea[:50]}...'")
-            model = genai.GenerativeModel('gemini-2.0-flash-thinking-exp-01-21')
-            response = model.generate_content(prompt)
+            response = self.model.generate_content(contents)
             
             if not response.text:
                 logger.error("Không nhận được phản hồi từ Gemini API")
@@ -193,8 +186,7 @@ class SceneSequenceGenerator:
         
         # Lưu kết quả vào file tạm thời cho các bước tiếp theo
         output_file = os.path.join(settings.TEMP_DIR, "scene_sequences.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(enhanced_idea, f, ensure_ascii=False, indent=2)
+        dump_json(enhanced_idea, output_file)
             
         logger.info(f"Đã lưu chuỗi cảnh vào file: {output_file}")
         
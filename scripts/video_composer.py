@@ -7,7 +7,6 @@ Sử dụng Creatomate API để kết hợp các tài nguyên đã tạo thành
 """
 
 import os
-import json
 import time
 import logging
 import requests
@@ -28,17 +27,12 @@ from config import settings
 from utils.google_sheets import GoogleSheetsManager
 from utils.google_drive import GoogleDriveManager
 from utils.base64_utils import save_base64_to_file
+from utils.retry import is_retryable, sleep_before_retry
+from utils.json_utils import load_json, dump_json
 
 # Thiết lập logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=settings.LOG_LEVEL,
-    format=settings.LOG_FORMAT,
-    handlers=[
-        logging.FileHandler(settings.LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+settings.configure_logging()
 
 class VideoComposer:
     """
@@ -77,8 +71,7 @@ class VideoComposer:
             # Ưu tiên đọc từ enhanced_audio_results.json trước
             enhanced_audio_file = os.path.join(self.temp_dir, "enhanced_audio_results.json")
             if os.path.exists(enhanced_audio_file):
-                with open(enhanced_audio_file, 'r', encoding='utf-8') as f:
-                    audio_results = json.load(f)
+                audio_results = load_json(enhanced_audio_file)
                 logger.info(f"Đã đọc {len(audio_results)} kết quả âm thanh đã tăng cường")
                 return audio_results
             
@@ -88,8 +81,7 @@ class VideoComposer:
                 logger.warning(f"Không tìm thấy file kết quả âm thanh: {audio_file}")
                 return []
             
-            with open(audio_file, 'r', encoding='utf-8') as f:
-                audio_results = json.load(f)
+            audio_results = load_json(audio_file)
             
             logger.info(f"Đã đọc {len(audio_results)} kết quả âm thanh")
             return audio_results
@@ -293,8 +285,7 @@ class VideoComposer:
                 logger.warning(f"Không tìm thấy file kết quả video, tìm kiếm kết quả hình ảnh thay thế")
                 return self.load_image_results()
             
-            with open(video_file, 'r', encoding='utf-8') as f:
-                video_results = json.load(f)
+            video_results = load_json(video_file)
             
             logger.info(f"Đã đọc {len(video_results)} kết quả video")
             return video_results
@@ -316,8 +307,7 @@ class VideoComposer:
                 logger.warning(f"Không tìm thấy file chuỗi cảnh: {scene_file}")
                 return []
             
-            with open(scene_file, 'r', encoding='utf-8') as f:
-                scene_data = json.load(f)
+            scene_data = load_json(scene_file)
             
             # Kiểm tra xem file có chứa danh sách cảnh không
             if "scenes" in scene_data and isinstance(scene_data["scenes"], list):
@@ -342,8 +332,7 @@ class VideoComposer:
             # Ưu tiên đọc từ enhanced_image_results.json trước
             enhanced_image_file = os.path.join(self.temp_dir, "enhanced_image_results.json")
             if os.path.exists(enhanced_image_file):
-                with open(enhanced_image_file, 'r', encoding='utf-8') as f:
-                    image_results = json.load(f)
+                image_results = load_json(enhanced_image_file)
                 logger.info(f"Đã đọc {len(image_results)} kết quả hình ảnh đã tăng cường")
                 return image_results
             
@@ -353,8 +342,7 @@ class VideoComposer:
                 logger.warning(f"Không tìm thấy file kết quả hình ảnh: {image_file}")
                 return []
             
-            with open(image_file, 'r', encoding='utf-8') as f:
-                image_results = json.load(f)
+            image_results = load_json(image_file)
             
             logger.info(f"Đã đọc {len(image_results)} kết quả hình ảnh")
             return image_results
@@ -524,14 +512,14 @@ class VideoComposer:
                     else:
                         logger.error(f"Phản hồi từ Creatomate thiếu thông tin: {result}")
                         if attempt < settings.MAX_RETRIES - 1:
-                            time.sleep(settings.RETRY_DELAY)
+                            sleep_before_retry(attempt)
                         else:
                             return {'error': 'Phản hồi không đầy đủ từ Creatomate API'}
                 
                 except requests.exceptions.RequestException as e:
                     logger.error(f"Lỗi kết nối đến Creatomate API (lần thử {attempt+1}/{settings.MAX_RETRIES}): {str(e)}")
-                    if attempt < settings.MAX_RETRIES - 1:
-                        time.sleep(settings.RETRY_DELAY)
+                    if attempt < settings.MAX_RETRIES - 1 and is_retryable(e):
+                        sleep_before_retry(attempt)
                     else:
                         return {'error': f'Lỗi kết nối: {str(e)}'}
             
@@ -973,7 +961,7 @@ class VideoComposer:
             
             # Tạo tên file với timestamp
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_filename = settings.FINAL_VIDEO_FILENAME.format(timestamp=timestamp)
+            output_filename = settings.final_video_filename(timestamp)
             output_path = os.path.join(self.temp_dir, output_filename)
             
             # Tải video - thử nhiều lần vì video có thể đang được tạo
@@ -1007,8 +995,8 @@ class VideoComposer:
                         continue
                     else:
                         logger.error(f"Lỗi khi tải video (lần thử {attempt+1}/{max_download_attempts}): {str(e)}")
-                        if attempt < max_download_attempts - 1:
-                            time.sleep(settings.RETRY_DELAY)
+                        if attempt < max_download_attempts - 1 and is_retryable(e):
+                            sleep_before_retry(attempt)
                         else:
                             return None
             
@@ -1347,7 +1335,7 @@ class VideoComposer:
             
             # Tạo tên file đầu ra với timestamp
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            final_output = os.path.join(self.temp_dir, settings.FINAL_VIDEO_FILENAME.format(timestamp=timestamp))
+            final_output = os.path.join(self.temp_dir, settings.final_video_filename(timestamp))
             
             # Ghép nối các video
             if not self.concatenate_videos(temp_video_paths, final_output):
@@ -1394,8 +1382,7 @@ class VideoComposer:
             
             # Lưu kết quả vào file JSON
             output_file = os.path.join(self.temp_dir, "composition_result.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+            dump_json(result, output_file)
                 
             logger.info(f"Đã lưu kết quả ghép video vào: {output_file}")
             
@@ -7,7 +7,6 @@ Sử dụng FFmpeg để tạo hiệu ứng zoom vào từ hình ảnh tĩnh, t
 """
 
 import os
-import json
 import time
 import logging
 import subprocess
@@ -26,17 +25,11 @@ from utils.google_sheets import GoogleSheetsManager
 from utils.google_drive import GoogleDriveManager
 from utils.ffmpeg_utils import create_zoom_video_from_image
 from utils.base64_utils import decode_base64_to_bytes, encode_file_to_base64
+from utils.json_utils import load_json, dump_json
 
 # Thiết lập logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=settings.LOG_LEVEL,
-    format=settings.LOG_FORMAT,
-    handlers=[
-        logging.FileHandler(settings.LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+settings.configure_logging()
 
 class VideoProcessor:
     """
@@ -102,8 +95,7 @@ class VideoProcessor:
             # Kiểm tra file từ image_generator - tên đúng là enhanced_image_results.json
             image_file = os.path.join(self.temp_dir, "enhanced_image_results.json")
             if os.path.exists(image_file):
-                with open(image_file, 'r', encoding='utf-8') as f:
-                    image_results = json.load(f)
+                image_results = load_json(image_file)
                 
                 logger.info(f"Đã đọc {len(image_results)} kết quả hình ảnh từ file")
                 return image_results
@@ -112,8 +104,7 @@ class VideoProcessor:
             alt_image_file = os.path.join(self.temp_dir, "image_results.json")
             if os.path.exists(alt_image_file):
                 logger.info(f"Sử dụng file thay thế: {alt_image_file}")
-                with open(alt_image_file, 'r', encoding='utf-8') as f:
-                    image_results = json.load(f)
+                image_results = load_json(alt_image_file)
                 
                 logger.info(f"Đã đọc {len(image_results)} kết quả hình ảnh từ file thay thế")
                 return image_results
@@ -459,7 +450,7 @@ class VideoProcessor:
                 }
             
             # Tạo tên file video
-            video_filename = settings.VIDEO_FILENAME_TEMPLATE.format(index=index)
+            video_filename = settings.video_filename(index)
             video_path = os.path.join(self.videos_dir, video_filename)
             
             # Tạo video với hiệu ứng zoom
@@ -574,8 +565,7 @@ class VideoProcessor:
         
         # Lưu kết quả vào file tạm thời cho các bước tiếp theo
         output_file = os.path.join(self.temp_dir, "video_results.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(video_results, f, ensure_ascii=False, indent=2)
+        dump_json(video_results, output_file)
         
         # Tổng kết
         success_count = sum(1 for r in video_results if r.get("success", False))
@@ -27,17 +27,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from config import settings
 from utils.google_sheets import GoogleSheetsManager
 from utils.google_drive import GoogleDriveManager
+from utils.json_utils import load_json, dump_json
 
 # Thiết lập logging với UTF-8 cho hỗ trợ tiếng Việt
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=settings.LOG_LEVEL,
-    format=settings.LOG_FORMAT,
-    handlers=[
-        logging.FileHandler(settings.LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+settings.configure_logging()
 
 class YouTubePublisher:
     """
@@ -158,8 +152,7 @@ class YouTubePublisher:
                 logger.warning(f"Không tìm thấy file kết quả ghép video: {result_file}")
                 return {}
             
-            with open(result_file, 'r', encoding='utf-8') as f:
-                result = json.load(f)
+            result = load_json(result_file)
             
             logger.info(f"Đã đọc kết quả ghép video từ {result_file}")
             return result
@@ -803,8 +796,7 @@ Experience ancient Egypt through the eyes of its people. This immersive first-pe
             
             # Lưu kết quả vào file
             output_file = os.path.join(self.temp_dir, "youtube_result.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+            dump_json(result, output_file)
             
             logger.info(f"Đã lưu kết quả đăng tải lên YouTube vào: {output_file}")
             self.delete_videos_from_drive()           
@@ -10,13 +10,16 @@ import os
 import io
 import logging
 import time
+import threading
 import base64
-from typing import List, Dict, Optional, Union, Any
+from typing import List, Dict, Optional, Union, Any, Tuple
 
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
+from googleapiclient.http import MediaFileUpload, MediaInMemoryUpload, MediaIoBaseDownload
 from google.auth.transport.requests import Request
+import httplib2
+import google_auth_httplib2
 
 # Import các module nội bộ
 from config import settings
@@ -37,39 +40,48 @@ class GoogleDriveManager:
         self.credentials_path = settings.GOOGLE_APPLICATION_CREDENTIALS
         self.api_service_name = "drive"
         self.api_version = "v3"
-        self._service = None  # Lazy initialization
+        self._credentials = None  # Lazy initialization
+        self._local = threading.local()  # httplib2 is not thread-safe: one service per thread
         
         logger.debug("Khởi tạo GoogleDriveManager")
     
     @property
     def service(self):
         """
-        Lấy dịch vụ Google Drive API, khởi tạo nếu chưa có.
+        Lấy dịch vụ Google Drive API của thread hiện tại, khởi tạo nếu chưa có.
         
         Returns:
             Resource: Đối tượng dịch vụ Google Drive
         """
-        if self._service is None:
+        service = getattr(self._local, "service", None)
+        if service is None:
             try:
-                # Nạp thông tin xác thực từ file service account
-                credentials = service_account.Credentials.from_service_account_file(
-                    self.credentials_path,
-                    scopes=['https://www.googleapis.com/auth/drive']
-                )
+                # Nạp thông tin xác thực từ file service account (dùng chung giữa các thread)
+                if self._credentials is None:
+                    self._credentials = service_account.Credentials.from_service_account_file(
+                        self.credentials_path,
+                        scopes=['https://www.googleapis.com/auth/drive']
+                    )
                 
-                # Tạo dịch vụ API
-                self._service = build(
+                # Tạo dịch vụ API cho thread hiện tại; kết nối HTTP của thread được
+                # giữ lại (keep-alive) cho mọi lời gọi Drive tiếp theo trong thread đó
+                http = google_auth_httplib2.AuthorizedHttp(
+                    self._credentials,
+                    http=httplib2.Http(timeout=settings.UPLOAD_TIMEOUT)
+                )
+                service = build(
                     self.api_service_name,
                     self.api_version,
-                    credentials=credentials,
+                    http=http,
                     cache_discovery=False
                 )
+                self._local.service = service
                 logger.info("Đã kết nối thành công với Google Drive API")
             except Exception as e:
                 logger.error(f"Lỗi khi khởi tạo dịch vụ Google Drive: {str(e)}")
                 raise
         
-        return self._service
+        return service
     
     def upload_file(self, file_path: str, filename: Optional[str] = None, 
                    mime_type: Optional[str] = None, folder_id: Optional[str] = None) -> Optional[str]:
@@ -103,8 +115,13 @@ class GoogleDriveManager:
             if folder_id:
                 file_metadata['parents'] = [folder_id]
             
-            # Tạo đối tượng media
-            media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
+            # Tạo đối tượng media (file nhỏ tải lên bằng một request duy nhất)
+            media = MediaFileUpload(
+                file_path,
+                mimetype=mime_type,
+                chunksize=settings.DRIVE_UPLOAD_CHUNK_SIZE,
+                resumable=os.path.getsize(file_path) > settings.DRIVE_RESUMABLE_THRESHOLD
+            )
             
             # Thực hiện tải lên
             file = self.service.files().create(
@@ -165,12 +182,12 @@ class GoogleDriveManager:
         except Exception as e:
             logger.error(f"Lỗi khi xóa file từ Google Drive: {str(e)}")
             return False  
-    def upload_from_base64(self, base64_data: str, filename: str, mime_type: str = "application/octet-stream", parent_folder_id: str = None) -> Optional[str]:
+    def upload_from_bytes(self, data: bytes, filename: str, mime_type: str = "application/octet-stream", parent_folder_id: str = None) -> Optional[str]:
         """
-        Tải lên file từ dữ liệu base64 lên Google Drive.
+        Tải lên file từ dữ liệu bytes trong bộ nhớ lên Google Drive.
         
         Args:
-            base64_data: Dữ liệu file dạng base64
+            data: Nội dung file
             filename: Tên file
             mime_type: Loại MIME của file
             parent_folder_id: ID thư mục đích (nếu None thì tải lên thư mục gốc)
@@ -179,9 +196,6 @@ class GoogleDriveManager:
             str: ID của file đã tải lên, hoặc None nếu có lỗi
         """
         try:
-            # Giải mã base64
-            file_data = base64.b64decode(base64_data)
-            
             # Tạo metadata
             file_metadata = {
                 'name': filename
@@ -191,11 +205,12 @@ class GoogleDriveManager:
             if parent_folder_id:
                 file_metadata['parents'] = [parent_folder_id]
             
-            # Tạo media object
-            media = MediaIoBaseUpload(
-                io.BytesIO(file_data),
+            # Tạo media object (dữ liệu nhỏ tải lên bằng một request duy nhất)
+            media = MediaInMemoryUpload(
+                data,
                 mimetype=mime_type,
-                resumable=True
+                chunksize=settings.DRIVE_UPLOAD_CHUNK_SIZE,
+                resumable=len(data) > settings.DRIVE_RESUMABLE_THRESHOLD
             )
             
             # Tải lên file
@@ -203,17 +218,39 @@ class GoogleDriveManager:
                 body=file_metadata,
                 media_body=media,
                 fields='id'
-            ).execute()
+            ).execute(num_retries=settings.MAX_RETRIES)  # googleapiclient tự backoff với lỗi 429/5xx
             
             file_id = file.get('id')
-            logger.info(f"Đã tải lên thành công file base64: {filename} (ID: {file_id})")
+            logger.info(f"Đã tải lên thành công file: {filename} (ID: {file_id})")
             
             return file_id
             
         except Exception as e:
-            logger.error(f"Lỗi khi tải file base64 lên Google Drive: {str(e)}")
+            logger.error(f"Lỗi khi tải file lên Google Drive: {str(e)}")
             return None
     
+    def upload_from_base64(self, base64_data: str, filename: str, mime_type: str = "application/octet-stream", parent_folder_id: str = None) -> Optional[str]:
+        """
+        Tải lên file từ dữ liệu base64 lên Google Drive.
+        
+        Args:
+            base64_data: Dữ liệu file dạng base64
+            filename: Tên file
+            mime_type: Loại MIME của file
+            parent_folder_id: ID thư mục đích (nếu None thì tải lên thư mục gốc)
+            
+        Returns:
+            str: ID của file đã tải lên, hoặc None nếu có lỗi
+        """
+        try:
+            # Giải mã base64
+            file_data = base64.b64decode(base64_data)
+        except Exception as e:
+            logger.error(f"Lỗi khi giải mã dữ liệu base64 của file {filename}: {str(e)}")
+            return None
+        
+        return self.upload_from_bytes(file_data, filename, mime_type, parent_folder_id)
+    
     def share_file(self, file_id: str, role: str = 'reader', 
                   type: str = 'anyone', email: Optional[str] = None) -> bool:
         """
@@ -284,6 +321,58 @@ class GoogleDriveManager:
             logger.error(f"Lỗi khi lấy webContentLink cho file (ID: {file_id}): {str(e)}")
             return None
     
+    def share_and_get_link(self, file_id: str, role: str = 'reader',
+                           type: str = 'anyone') -> Tuple[bool, Optional[str]]:
+        """
+        Chia sẻ file và lấy webContentLink trong cùng một batch request
+        (gộp share_file và get_web_content_link thành một round-trip HTTP).
+        
+        Args:
+            file_id: ID của file cần chia sẻ
+            role: Quyền của người được chia sẻ ('reader', 'writer', 'commenter')
+            type: Loại đối tượng được chia sẻ ('domain', 'anyone')
+            
+        Returns:
+            Tuple[bool, Optional[str]]: (chia sẻ thành công, webContentLink hoặc None)
+        """
+        responses: Dict[str, Any] = {}
+        
+        def collect(request_id, response, exception):
+            if exception is not None:
+                logger.error(f"Lỗi trong batch request '{request_id}' cho file (ID: {file_id}): {str(exception)}")
+            responses[request_id] = None if exception is not None else response
+        
+        try:
+            # webContentLink không phụ thuộc quyền chia sẻ nên hai request có thể chạy theo thứ tự bất kỳ
+            batch = self.service.new_batch_http_request(callback=collect)
+            batch.add(
+                self.service.permissions().create(
+                    fileId=file_id,
+                    body={'type': type, 'role': role},
+                    fields='id',
+                    sendNotificationEmail=False
+                ),
+                request_id='share'
+            )
+            batch.add(
+                self.service.files().get(fileId=file_id, fields='webContentLink'),
+                request_id='link'
+            )
+            batch.execute()
+        except Exception as e:
+            logger.error(f"Lỗi khi chia sẻ và lấy link cho file (ID: {file_id}): {str(e)}")
+            return False, None
+        
+        sharing_success = responses.get('share') is not None
+        web_content_link = (responses.get('link') or {}).get('webContentLink')
+        
+        if sharing_success:
+            logger.info(f"Đã chia sẻ file (ID: {file_id}) với quyền {role} cho {type}")
+        if not web_content_link:
+            logger.warning(f"Không tìm thấy webContentLink cho file (ID: {file_id})")
+        
+        return sharing_success, web_content_link
+    
     def delete_file(self, file_id: str) -> bool:
         """
         Xóa file trên Google Drive.
@@ -422,8 +511,13 @@ class GoogleDriveManager:
                 logger.error(f"File không tồn tại: {file_path}")
                 return False
             
-            # Tạo đối tượng media
-            media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
+            # Tạo đối tượng media (file nhỏ tải lên bằng một request duy nhất)
+            media = MediaFileUpload(
+                file_path,
+                mimetype=mime_type,
+                chunksize=settings.DRIVE_UPLOAD_CHUNK_SIZE,
+                resumable=os.path.getsize(file_path) > settings.DRIVE_RESUMABLE_THRESHOLD
+            )
             
             # Cập nhật file
             self.service.files().update(
@@ -363,7 +363,7 @@ class GoogleSheetsManager:
                 if not status:
                     status = idea.get('Status_Publishing', '')
                 
-                if status.lower() == settings.STATUS_FOR_PUBLISHING.lower():
+                if status.lower() == settings.STATUS_FOR_PUBLISHING:
                     publishing_ideas.append(idea)
             
             logger.info(f"Đã tìm thấy {len(publishing_ideas)} ý tưởng cần xuất bản")
@@ -419,7 +419,7 @@ class GoogleSheetsManager:
                         values[i] = values[i] + [''] * (len(headers) - len(values[i]))
             
             # Tìm dòng có ID tương ứng
-            id_col_index = headers.index("ID") if "ID" in headers else 0
+            id_col_index = headers.index("ID") if "ID" in headers else self.columns.ID
             row_index = None
             
             for i, row in enumerate(values[1:], 1):
@@ -493,7 +493,7 @@ class GoogleSheetsManager:
                 return False
             
             # Tìm dòng có ID tương ứng
-            id_col_index = headers.index("ID") if "ID" in headers else 0
+            id_col_index = headers.index("ID") if "ID" in headers else self.columns.ID
             row_index = None
             
             for i, row in enumerate(values[1:], 1):
@@ -571,8 +571,8 @@ class GoogleSheetsManager:
                     [headers]
                 )
             
-            # Lấy ID lớn nhất hiện có - cải thiện cách tìm ID
-            next_id = self.get_next_available_id()
+            # Lấy ID lớn nhất hiện có từ dữ liệu vừa đọc (không đọc lại sheet)
+            next_id = self._next_id_from_values(current_values)
             logger.info(f"Bắt đầu thêm ý tưởng mới với ID: {next_id}")
             
             # Chuẩn bị dữ liệu để thêm vào
@@ -616,11 +616,14 @@ class GoogleSheetsManager:
                 logger.debug(f"Dòng dữ liệu mới: ID={current_id}, dữ liệu={row}")
                 rows.append(row)
             
-            # Thêm vào sheet
+            # Thêm tất cả các dòng vào sheet trong một request
             result = self.append_values(range_name, rows)
             end_id = starting_id + len(ideas) - 1
             
             if result > 0:
+                # Ghi lại ID thực tế đã dùng trong sheet vào các ý tưởng
+                for idea_index, idea in enumerate(ideas):
+                    idea["ID"] = str(starting_id + idea_index)
                 logger.info(f"Đã thêm {len(ideas)} ý tưởng mới vào sheet với ID từ {starting_id} đến {end_id}")
                 return True
             else:
@@ -665,6 +668,49 @@ class GoogleSheetsManager:
             logger.error(f"Lỗi khi tìm ý tưởng với ID {idea_id}: {str(e)}")
             return None
     
+    def _next_id_from_values(self, values: List[List[Any]]) -> int:
+        """
+        Tính ID tiếp theo từ dữ liệu sheet đã đọc (không gọi API).
+        
+        Args:
+            values: Dữ liệu sheet, dòng đầu là header
+            
+        Returns:
+            int: ID tiếp theo (lớn nhất + 1)
+        """
+        if not values or len(values) < 2:
+            logger.info("Sheet trống hoặc chỉ có header, bắt đầu với ID = 1")
+            return 1
+        
+        # Tìm vị trí cột ID
+        headers = values[0]
+        id_column_index = -1
+        for i, header in enumerate(headers):
+            if header.upper() == "ID":
+                id_column_index = i
+                break
+        
+        if id_column_index == -1:
+            logger.warning("Không tìm thấy cột ID, bắt đầu với ID = 1")
+            return 1
+        
+        # Tìm ID lớn nhất
+        max_id = 0
+        for row in values[1:]:  # Bỏ qua dòng header
+            if len(row) > id_column_index:
+                try:
+                    # Loại bỏ khoảng trắng và chuyển đổi sang số
+                    id_str = row[id_column_index].strip()
+                    if id_str and id_str.isdigit():
+                        id_value = int(id_str)
+                        max_id = max(max_id, id_value)
+                except (ValueError, TypeError, IndexError) as e:
+                    logger.debug(f"Bỏ qua giá trị ID không hợp lệ: {str(e)}")
+        
+        next_id = max_id + 1
+        logger.info(f"ID lớn nhất hiện có: {max_id}, ID tiếp theo: {next_id}")
+        return next_id
+    
     def get_next_available_id(self) -> int:
         """
         Lấy ID tiếp theo có thể sử dụng bằng cách tìm ID lớn nhất trong sheet.
@@ -675,41 +721,8 @@ class GoogleSheetsManager:
         try:
             # Lấy tất cả dữ liệu từ sheet
             range_name = f"{self.sheet_name}!{settings.IDEAS_SHEET_RANGE}"
-            values = self.get_values(range_name)
-            
-            if not values or len(values) < 2:
-                logger.info("Sheet trống hoặc chỉ có header, bắt đầu với ID = 1")
-                return 1
-            
-            # Tìm vị trí cột ID
-            headers = values[0]
-            id_column_index = -1
-            for i, header in enumerate(headers):
-                if header.upper() == "ID":
-                    id_column_index = i
-                    break
-            
-            if id_column_index == -1:
-                logger.warning("Không tìm thấy cột ID, bắt đầu với ID = 1")
-                return 1
-            
-            # Tìm ID lớn nhất
-            max_id = 0
-            for row in values[1:]:  # Bỏ qua dòng header
-                if len(row) > id_column_index:
-                    try:
-                        # Loại bỏ khoảng trắng và chuyển đổi sang số
-                        id_str = row[id_column_index].strip()
-                        if id_str and id_str.isdigit():
-                            id_value = int(id_str)
-                            max_id = max(max_id, id_value)
-                    except (ValueError, TypeError, IndexError) as e:
-                        logger.debug(f"Bỏ qua giá trị ID không hợp lệ: {str(e)}")
-            
-            next_id = max_id + 1
-            logger.info(f"ID lớn nhất hiện có: {max_id}, ID tiếp theo: {next_id}")
-            return next_id
+            return self._next_id_from_values(self.get_values(range_name))
             
         except Exception as e:
             logger.error(f"Lỗi khi lấy ID tiếp theo: {str(e)}")
-            return 1
\ No newline at end of file
+            return 1
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Module tiện ích đọc/ghi file JSON trung gian trong hệ thống tạo video POV.
+Dùng orjson (thư viện C) khi đã được cài đặt, nếu không thì dùng json chuẩn
+với cùng định dạng đầu ra (UTF-8, thụt lề 2 khoảng trắng hoặc dạng gọn theo settings.PRETTY_JSON).
+"""
+
+import json
+import logging
+from typing import Any
+
+# Import các module nội bộ
+from config import settings
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def load_json(path: str) -> Any:
+    """
+    Đọc dữ liệu từ file JSON.
+
+    Args:
+        path: Đường dẫn file JSON
+
+    Returns:
+        Any: Dữ liệu đã giải mã
+    """
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def dump_json(data: Any, path: str) -> None:
+    """
+    Ghi dữ liệu ra file JSON (UTF-8; thụt lề 2 khoảng trắng khi settings.PRETTY_JSON, nếu không thì dạng gọn).
+
+    Args:
+        data: Dữ liệu cần ghi
+        path: Đường dẫn file JSON
+    """
+    pretty = settings.PRETTY_JSON
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=option))
+        return
+
+    # Tuần tự hóa một lần rồi ghi một lần (json.dump ghi từng mảnh nhỏ)
+    if pretty:
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+    else:
+        text = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Module cache kết quả tạo nội dung (âm thanh, hình ảnh, prompt) trong hệ thống tạo video POV.
+Lưu kết quả đã tạo theo hash của (biến thể, nội dung đầu vào), để các lần chạy sau
+bỏ qua bước gọi API tạo nội dung (và bước tải lên Google Drive với media).
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+class MediaCache:
+    """
+    Cache thông tin media đã tạo, lưu trong một file JSON chỉ mục.
+    An toàn khi được gọi từ nhiều thread.
+    """
+
+    def __init__(self, cache_file: str, max_age: Optional[float] = None, required_key: str = "file_id"):
+        """
+        Khởi tạo cache và nạp chỉ mục từ file (nếu có).
+
+        Args:
+            cache_file: Đường dẫn file chỉ mục
+            max_age: Thời gian sống của một mục (giây), None nếu không giới hạn
+            required_key: Trường bắt buộc phải có giá trị để mục cache hợp lệ
+        """
+        self.cache_file = cache_file
+        self.max_age = max_age
+        self.required_key = required_key
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    @staticmethod
+    def make_key(text: str, variant: str) -> str:
+        """
+        Tạo khóa cache cho một nội dung đầu vào.
+
+        Args:
+            text: Nội dung đầu vào (văn bản, prompt)
+            variant: Các tham số ảnh hưởng đến kết quả (ngôn ngữ, giọng, model...)
+
+        Returns:
+            str: Hash SHA-256 của (biến thể, nội dung)
+        """
+        return hashlib.sha256(f"{variant}|{text}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Đọc chỉ mục cache từ file.
+
+        Returns:
+            Dict: Chỉ mục cache, rỗng nếu file chưa có hoặc bị lỗi
+        """
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            logger.info(f"Đã nạp {len(entries)} mục từ cache {os.path.basename(self.cache_file)}")
+            return entries
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Không thể đọc cache {self.cache_file}, bắt đầu với cache rỗng: {str(e)}")
+            return {}
+
+    def get(self, text: str, variant: str) -> Optional[Dict[str, Any]]:
+        """
+        Lấy thông tin media đã cache cho nội dung đầu vào.
+
+        Mục cache chỉ hợp lệ khi có required_key (mặc định file trên Drive), chưa hết hạn, và file cục bộ
+        (nếu có) vẫn còn nguyên như lúc lưu (tên file có thể bị lần chạy sau ghi đè).
+
+        Args:
+            text: Nội dung đầu vào
+            variant: Các tham số ảnh hưởng đến kết quả
+
+        Returns:
+            Dict: Bản sao mục cache, hoặc None nếu không có
+        """
+        with self._lock:
+            entry = self._entries.get(self.make_key(text, variant))
+
+        if not entry or not entry.get(self.required_key):
+            return None
+
+        if self.max_age is not None and time.time() - entry.get("ts", 0) > self.max_age:
+            return None
+
+        local_path = entry.get("local_path")
+        if local_path:
+            try:
+                if os.stat(local_path).st_mtime_ns != entry.get("local_mtime_ns"):
+                    return None
+            except OSError:
+                return None
+
+        return dict(entry)
+
+    def put(self, text: str, variant: str, entry: Dict[str, Any]) -> None:
+        """
+        Lưu thông tin media vào cache và ghi chỉ mục ra file.
+
+        Args:
+            text: Nội dung đầu vào
+            variant: Các tham số ảnh hưởng đến kết quả
+            entry: Thông tin cần lưu (file_id, web_content_link, local_path)
+        """
+        entry = dict(entry, ts=time.time())
+        local_path = entry.get("local_path")
+        if local_path:
+            try:
+                entry["local_mtime_ns"] = os.stat(local_path).st_mtime_ns
+            except OSError:
+                entry["local_path"] = None
+
+        with self._lock:
+            self._entries[self.make_key(text, variant)] = entry
+            self._save()
+
+    def _save(self) -> None:
+        """
+        Ghi chỉ mục cache ra file tạm rồi thay thế file cũ (gọi khi đang giữ lock).
+        """
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=cache_dir, delete=False, encoding='utf-8') as tmp:
+                json.dump(self._entries, tmp, ensure_ascii=False)
+            os.replace(tmp.name, self.cache_file)
+        except Exception as e:
+            logger.warning(f"Không thể ghi cache {self.cache_file}: {str(e)}")
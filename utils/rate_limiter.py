@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Module giới hạn tốc độ gọi API trong hệ thống tạo video POV.
+Dùng thuật toán token bucket, chia sẻ an toàn giữa nhiều thread.
+"""
+
+import time
+import logging
+import threading
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    Token bucket: nạp lại `rate` token mỗi giây, tối đa `capacity` token.
+    Mỗi lời gọi API lấy một token, chờ khi bucket đã cạn.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Khởi tạo bucket đầy token.
+
+        Args:
+            rate: Số token được nạp lại mỗi giây (số request/giây cho phép)
+            capacity: Số token tối đa (số request được phép gửi dồn một lúc)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        """
+        Lấy token từ bucket, chờ đến khi đủ token.
+
+        Args:
+            tokens: Số token cần lấy
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                wait = (tokens - self._tokens) / self.rate
+
+            # Chờ ngoài lock để các thread khác vẫn kiểm tra được bucket
+            time.sleep(wait)
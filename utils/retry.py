@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Module tiện ích thử lại các lời gọi API trong hệ thống tạo video POV.
+Cung cấp thời gian chờ tăng theo cấp số nhân kèm jitter, cho cả code đồng bộ và asyncio.
+"""
+
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+# Import các module nội bộ
+from config import settings
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+def backoff_delay(attempt: int, base_delay: Optional[float] = None, max_delay: Optional[float] = None) -> float:
+    """
+    Tính thời gian chờ trước lần thử lại tiếp theo.
+    
+    Args:
+        attempt: Số thứ tự lần thử vừa thất bại (bắt đầu từ 0)
+        base_delay: Thời gian chờ lần đầu (mặc định settings.RETRY_BASE_DELAY)
+        max_delay: Thời gian chờ tối đa (mặc định settings.RETRY_MAX_DELAY)
+        
+    Returns:
+        float: Số giây cần chờ, tăng gấp đôi mỗi lần và có jitter ngẫu nhiên
+    """
+    base_delay = settings.RETRY_BASE_DELAY if base_delay is None else base_delay
+    max_delay = settings.RETRY_MAX_DELAY if max_delay is None else max_delay
+    delay = min(max_delay, base_delay * (2 ** attempt))
+    return delay * (1 + random.uniform(-settings.RETRY_JITTER, settings.RETRY_JITTER))
+
+def retry_after_delay(error: Optional[BaseException]) -> Optional[float]:
+    """
+    Đọc thời gian chờ server yêu cầu qua header Retry-After (dạng số giây).
+    
+    Args:
+        error: Exception vừa xảy ra (có thể None)
+        
+    Returns:
+        float: Số giây cần chờ (tối đa settings.RETRY_MAX_DELAY), None nếu không có header
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return min(settings.RETRY_MAX_DELAY, max(0.0, float(headers["Retry-After"])))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Kiểm tra lỗi có đáng để thử lại hay không.
+    
+    Lỗi HTTP 5xx, 429 và lỗi kết nối được thử lại; các lỗi 4xx khác là lỗi
+    của request nên thử lại chỉ lãng phí thời gian chờ.
+    
+    Args:
+        error: Exception vừa xảy ra
+        
+    Returns:
+        bool: True nếu nên thử lại
+    """
+    # requests gắn response vào lỗi, gTTS dùng thuộc tính rsp,
+    # còn googleapiclient.HttpError dùng resp.status
+    # (so sánh với None: requests.Response mang mã 4xx/5xx có giá trị bool là False)
+    response = getattr(error, "response", None)
+    if response is None:
+        response = getattr(error, "rsp", None)
+    status_code = getattr(response, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "resp", None), "status", None)
+    if status_code is None:
+        return True
+    status_code = int(status_code)
+    return status_code == 429 or status_code >= 500
+
+def sleep_before_retry(attempt: int, error: Optional[BaseException] = None) -> None:
+    """
+    Chờ trước lần thử lại tiếp theo (phiên bản đồng bộ).
+    
+    Args:
+        attempt: Số thứ tự lần thử vừa thất bại (bắt đầu từ 0)
+        error: Exception vừa xảy ra; nếu server gửi Retry-After thì chờ theo header đó
+    """
+    delay = retry_after_delay(error)
+    time.sleep(backoff_delay(attempt) if delay is None else delay)
+
+def with_retry(func: Callable[..., Any], *args: Any, max_retries: Optional[int] = None, **kwargs: Any) -> Any:
+    """
+    Gọi một hàm đồng bộ, thử lại với backoff khi gặp lỗi có thể thử lại.
+    
+    Args:
+        func: Hàm cần gọi
+        *args: Tham số vị trí cho hàm
+        max_retries: Số lần thử tối đa (mặc định settings.MAX_RETRIES)
+        **kwargs: Tham số từ khóa cho hàm
+        
+    Returns:
+        Kết quả của hàm
+        
+    Raises:
+        Exception: Lỗi cuối cùng nếu mọi lần thử đều thất bại hoặc lỗi không thể thử lại
+    """
+    max_retries = max_retries or settings.MAX_RETRIES
+    for attempt in range(max_retries):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_retries - 1 or not is_retryable(e):
+                raise
+            delay = retry_after_delay(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            logger.warning(f"Lỗi khi gọi {getattr(func, '__name__', func)} (lần thử {attempt+1}/{max_retries}): {str(e)}, thử lại sau {delay:.1f} giây")
+            time.sleep(delay)
+
+async def async_with_retry(func: Callable[..., Awaitable[Any]], *args: Any, max_retries: Optional[int] = None, **kwargs: Any) -> Any:
+    """
+    Gọi một coroutine, thử lại với backoff khi gặp lỗi có thể thử lại.
+    Thời gian chờ dùng asyncio.sleep nên không chặn các tác vụ khác.
+    
+    Args:
+        func: Hàm async cần gọi
+        *args: Tham số vị trí cho hàm
+        max_retries: Số lần thử tối đa (mặc định settings.MAX_RETRIES)
+        **kwargs: Tham số từ khóa cho hàm
+        
+    Returns:
+        Kết quả của coroutine
+        
+    Raises:
+        Exception: Lỗi cuối cùng nếu mọi lần thử đều thất bại hoặc lỗi không thể thử lại
+    """
+    max_retries = max_retries or settings.MAX_RETRIES
+    for attempt in range(max_retries):
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_retries - 1 or not is_retryable(e):
+                raise
+            delay = retry_after_delay(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            logger.warning(f"Lỗi khi gọi {getattr(func, '__name__', func)} (lần thử {attempt+1}/{max_retries}): {str(e)}, thử lại sau {delay:.1f} giây")
+            await asyncio.sleep(delay)
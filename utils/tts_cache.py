@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Module cache kết quả chuyển văn bản thành giọng nói trong hệ thống tạo video POV.
+Lưu thông tin file âm thanh đã tạo và tải lên theo hash của (giọng đọc, văn bản),
+để các lần chạy sau bỏ qua cả bước gọi TTS lẫn bước tải lên Google Drive.
+"""
+
+import os
+import logging
+from typing import Optional
+
+# Import các module nội bộ
+from config import settings
+from utils.media_cache import MediaCache
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+class TTSCache(MediaCache):
+    """
+    Cache thông tin âm thanh đã tạo, lưu trong temp/tts_cache.json.
+    An toàn khi được gọi từ nhiều thread.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None):
+        """
+        Khởi tạo cache và nạp chỉ mục từ file (nếu có).
+
+        Args:
+            cache_file: Đường dẫn file chỉ mục (mặc định: temp/tts_cache.json)
+        """
+        super().__init__(cache_file or os.path.join(settings.TEMP_DIR, "tts_cache.json"))